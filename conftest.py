@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def inline_background_jobs(settings):
+    """
+    Миниатюры и рассылки в тестах выполняются сразу после коммита:
+    задача в пуле потоков пережила бы тест, его транзакцию и временный
+    MEDIA_ROOT. Тесты самого пула включают потоки через
+    override_settings.
+    """
+    settings.THUMBNAIL_WORKERS = 0
+    settings.NOTIFICATION_WORKERS = 0
@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import database, query_audit
+        if getattr(settings, 'QUERY_AUDIT_ENABLED', settings.DEBUG):
+            connection_created.connect(query_audit.install)
+            request_started.connect(query_audit.start_request_audit)
+            request_finished.connect(query_audit.finish_request_audit)
+        connection_created.connect(database.apply_pragmas)
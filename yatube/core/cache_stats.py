@@ -0,0 +1,65 @@
+"""
+Счётчики попаданий и промахов фрагментного кеша.
+
+Имена фрагментов хранятся не одним множеством, которое параллельные
+запросы перезаписывали бы друг у друга, а в пронумерованных ячейках:
+первый записавший имя получает через cache.add право на него и
+следующий номер через cache.incr.
+"""
+from django.core.cache import cache
+
+COUNT_KEY = 'fragment_stats:name_count'
+
+
+def _key(name, outcome):
+    return f'fragment_stats:{name}:{outcome}'
+
+
+def _slot_key(number):
+    return f'fragment_stats:name:{number}'
+
+
+def _register(name):
+    if not cache.add(_key(name, 'known'), True, None):
+        return
+    cache.add(COUNT_KEY, 0, None)
+    cache.set(_slot_key(cache.incr(COUNT_KEY)), name, None)
+
+
+def record_fragment(name, hit):
+    key = _key(name, 'hits' if hit else 'misses')
+    if cache.add(key, 1, None):
+        _register(name)
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def fragment_names():
+    count = cache.get(COUNT_KEY, 0)
+    slots = cache.get_many(
+        [_slot_key(number) for number in range(1, count + 1)]
+    )
+    return sorted(set(slots.values()))
+
+
+def fragment_stats():
+    """Возвращает {имя фрагмента: попадания, промахи, доля попаданий}."""
+    names = fragment_names()
+    values = cache.get_many(
+        [_key(name, outcome)
+         for name in names for outcome in ('hits', 'misses')]
+    )
+    stats = {}
+    for name in names:
+        hits = values.get(_key(name, 'hits'), 0)
+        misses = values.get(_key(name, 'misses'), 0)
+        total = hits + misses
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 3) if total else None,
+        }
+    return stats
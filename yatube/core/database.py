@@ -0,0 +1,116 @@
+"""
+Соединения с базой по профилю настроек (DATABASE_PROFILE).
+
+apply_pragmas - обработчик connection_created: выполняет на каждом
+новом соединении SQLite PRAGMA из ключа PRAGMAS настроек базы. При
+постоянных соединениях (CONN_MAX_AGE) это происходит раз на поток.
+
+ReplicaRouter отправляет чтение лент - постов, групп, комментариев и
+строк ленты подписок - на реплики из DATABASE_REPLICAS, остальное
+на основную базу. Реплики отстают, поэтому запрос, который что-то
+записал, дальше читает только основную базу, а ReplicaPinMiddleware
+оставляет на ней и запросы того же клиента в следующие
+REPLICA_PIN_SECONDS: после отправки формы редирект покажет уже
+сохранённый пост.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary'
+# Модели, которые читают ленты
+REPLICA_MODELS = {
+    'posts.post',
+    'posts.group',
+    'posts.comment',
+    'posts.feedentry',
+}
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS', {})
+    # В обход обёрток execute: настройка соединения - не запрос страницы
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def pin(value=True):
+    _state.pinned = value
+
+
+@contextmanager
+def use_primary():
+    """Читать только основную базу внутри блока."""
+    previous = is_pinned()
+    pin()
+    try:
+        yield
+    finally:
+        pin(previous)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if (not aliases or is_pinned()
+                or model._meta.label_lower not in REPLICA_MODELS
+                # Внутри транзакции читаем то, что в ней записано
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return None
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        if replicas():
+            pin()
+            _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin(PIN_COOKIE in request.COOKIES)
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(),
+                                    httponly=True, samesite='Lax')
+            return response
+        finally:
+            pin(False)
@@ -0,0 +1,50 @@
+"""
+PostgreSQL с пулом соединений psycopg2.
+
+Django закрывает соединение в конце запроса (CONN_MAX_AGE=0), а этот
+бэкенд вместо закрытия возвращает его в ThreadedConnectionPool, и
+следующий запрос получает готовое соединение без подключения к серверу.
+Размер пула задаёт ключ POOL настроек базы: {'MIN': 1, 'MAX': 20}.
+Пул отдельный на каждый набор параметров подключения, поэтому тестовая
+база не получит соединений рабочей.
+"""
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+_lock = threading.Lock()
+_pools = {}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        key = repr(sorted(conn_params.items()))
+        with _lock:
+            if key not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                _pools[key] = pool.ThreadedConnectionPool(
+                    options.get('MIN', 1), options.get('MAX', 20),
+                    **conn_params,
+                )
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        # Пул запоминается, чтобы вернуть соединение именно в него
+        self.connection_pool = self.get_pool(conn_params)
+        connection = self.connection_pool.getconn()
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level,
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            # Незавершённую транзакцию пул откатит, сломанное
+            # соединение закроет
+            self.connection_pool.putconn(self.connection)
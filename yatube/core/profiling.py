@@ -0,0 +1,267 @@
+"""
+Замеры каждого запроса: время ответа, SQL-запросы, шаблоны и кеш.
+
+ProfilingMiddleware собирает расходы запроса в RequestStats текущего
+потока: SQL считает execute_wrapper соединений, время шаблонов -
+бэкенд ProfilingTemplates, обращения к кешу - бэкенды с
+CountingCacheMixin. Итог уходит в заголовок Server-Timing и в
+гистограммы по имени view за последние PROFILING_WINDOW_MINUTES минут,
+которые отдаёт служебная страница internal/requests/.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache.backends import locmem, memcached
+from django.db import connections
+from django.template.backends import django as django_backend
+
+from . import sqlite_cache
+
+# Верхние границы корзин гистограммы, мс
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+UNRESOLVED = '<unresolved>'
+
+_state = threading.local()
+_windows = {}
+_lock = threading.Lock()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_depth = 0
+        self.cache_paused = False
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - started) * 1000
+
+    def server_timing(self, total_ms):
+        return ', '.join((
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} SQL"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'cache;desc="hit {self.cache_hits} miss {self.cache_misses}"',
+            f'total;dur={total_ms:.1f}',
+        ))
+
+
+def current():
+    """RequestStats текущего запроса или None вне запроса."""
+    return getattr(_state, 'stats', None)
+
+
+class ViewStats:
+    def __init__(self):
+        self.histogram = [0] * len(BUCKETS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, total_ms, stats):
+        self.histogram[bisect_left(BUCKETS, total_ms)] += 1
+        self.count += 1
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.queries += stats.queries
+        self.db_ms += stats.db_ms
+        self.template_ms += stats.template_ms
+        self.cache_hits += stats.cache_hits
+        self.cache_misses += stats.cache_misses
+
+    def merge(self, other):
+        self.histogram = [a + b for a, b in
+                          zip(self.histogram, other.histogram)]
+        for field in ('count', 'total_ms', 'queries', 'db_ms',
+                      'template_ms', 'cache_hits', 'cache_misses'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, share):
+        """Верхняя граница корзины, в которую попадает доля share."""
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.histogram):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'p50_ms': round(self.percentile(0.5), 1),
+            'p95_ms': round(self.percentile(0.95), 1),
+            'p99_ms': round(self.percentile(0.99), 1),
+            'mean_ms': round(self.total_ms / count, 1),
+            'max_ms': round(self.max_ms, 1),
+            'queries_mean': round(self.queries / count, 1),
+            'db_ms_mean': round(self.db_ms / count, 1),
+            'template_ms_mean': round(self.template_ms / count, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'histogram': {
+                'inf' if bound == float('inf') else str(bound): count
+                for bound, count in zip(BUCKETS, self.histogram)
+            },
+        }
+
+
+def window_minutes():
+    return getattr(settings, 'PROFILING_WINDOW_MINUTES', 15)
+
+
+def record(view_name, total_ms, stats):
+    minute = int(time.time() // 60)
+    with _lock:
+        window = _windows.setdefault(minute, {})
+        window.setdefault(view_name, ViewStats()).add(total_ms, stats)
+        for old in [key for key in _windows
+                    if key <= minute - window_minutes()]:
+            del _windows[old]
+
+
+def view_stats():
+    """Сводка по view за окно, самые дорогие по суммарному времени первыми."""
+    oldest = int(time.time() // 60) - window_minutes()
+    merged = {}
+    with _lock:
+        for minute, window in _windows.items():
+            if minute <= oldest:
+                continue
+            for name, stats in window.items():
+                merged.setdefault(name, ViewStats()).merge(stats)
+    ordered = sorted(merged.items(), key=lambda item: -item[1].total_ms)
+    return {name: stats.as_dict() for name, stats in ordered}
+
+
+def reset():
+    with _lock:
+        _windows.clear()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = _state.stats = RequestStats()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _state.stats = None
+        total_ms = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        record(match.view_name if match else UNRESOLVED, total_ms, stats)
+        if self.show_timing(request):
+            response['Server-Timing'] = stats.server_timing(total_ms)
+        return response
+
+    def show_timing(self, request):
+        if getattr(settings, 'PROFILING_SERVER_TIMING', False):
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+
+class ProfilingTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        stats = current()
+        if stats is None:
+            return super().render(context, request)
+        # Вложенный render_to_string уже учтён внешним шаблоном
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_ms += (time.perf_counter() - started) * 1000
+
+
+class ProfilingTemplates(django_backend.DjangoTemplates):
+    """DjangoTemplates, замеряющий время отрисовки шаблонов запроса."""
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return ProfilingTemplate(template.template, self)
+
+
+_MISSING = object()
+
+
+@contextmanager
+def _cache_paused(stats):
+    # get_many базового кеша сводится к get: считаем ключи один раз
+    stats.cache_paused = True
+    try:
+        yield
+    finally:
+        stats.cache_paused = False
+
+
+def _count_cache(hits, misses):
+    stats = current()
+    if stats is not None and not stats.cache_paused:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class CountingCacheMixin:
+    """Считает попадания и промахи кеша в текущем запросе."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            _count_cache(0, 1)
+            return default
+        _count_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        stats = current()
+        if stats is None or stats.cache_paused:
+            return super().get_many(keys, version)
+        with _cache_paused(stats):
+            found = super().get_many(keys, version)
+        _count_cache(len(found), len(keys) - len(found))
+        return found
+
+
+class LocMemCache(CountingCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class SQLiteCache(CountingCacheMixin, sqlite_cache.SQLiteCache):
+    pass
+
+
+class PyLibMCCache(CountingCacheMixin, memcached.PyLibMCCache):
+    pass
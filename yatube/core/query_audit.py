@@ -0,0 +1,185 @@
+"""
+Поиск повторяющихся и медленных SQL-запросов.
+
+При QUERY_AUDIT_ENABLED (по умолчанию DEBUG и в тестах) audit_query
+ставится в execute_wrappers каждого соединения (см. CoreConfig.ready).
+В пределах одного запроса к сайту он считает запросы одной формы:
+SQL с плейсхолдерами, где списки IN (%s, ...) свёрнуты. Форма,
+выполненная QUERY_AUDIT_DUPLICATES раз и больше, - признак N+1.
+Запросы дольше QUERY_AUDIT_SLOW_MS отмечаются везде. Каждая находка
+привязывается к view, строке кода проекта и узлу шаблона, из которых
+пришёл запрос, и пишется в лог одной JSON-строкой. В строгом режиме
+(QUERY_AUDIT_STRICT) находки запроса превращаются в QueryAuditError
+по его окончании, и тест падает.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.template.base import Node
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+# Управление транзакциями повторяется законно и данных не читает
+TRANSACTION_RE = re.compile(
+    r'(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.IGNORECASE,
+)
+MAX_LOCATIONS = 5
+# Обёртки самого ядра не считаются источником запроса
+SKIP_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiling.py'),
+}
+
+_state = threading.local()
+
+
+class QueryAuditError(AssertionError):
+    pass
+
+
+def duplicates_limit():
+    return getattr(settings, 'QUERY_AUDIT_DUPLICATES', 3)
+
+
+def slow_ms():
+    return getattr(settings, 'QUERY_AUDIT_SLOW_MS', 100)
+
+
+def is_strict():
+    return getattr(settings, 'QUERY_AUDIT_STRICT', False)
+
+
+def shape(sql):
+    return IN_LIST_RE.sub('IN (%s...)', sql)
+
+
+class RequestAudit:
+    def __init__(self, path):
+        self.path = path
+        self.counts = {}
+        self.locations = {}
+        self.findings = []
+
+    @property
+    def view(self):
+        try:
+            return resolve(self.path).view_name
+        except Resolver404:
+            return None
+
+    def seen(self, sql):
+        """Учитывает запрос; для повторов запоминает, откуда он."""
+        key = shape(sql)
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        if count > 1:
+            places = self.locations.setdefault(key, {})
+            place = locate()
+            if place in places or len(places) < MAX_LOCATIONS:
+                places[place] = places.get(place, 0) + 1
+
+    def duplicates(self):
+        limit = duplicates_limit()
+        return [
+            {
+                'kind': 'duplicate',
+                'view': self.view,
+                'path': self.path,
+                'sql': key,
+                'count': count,
+                'locations': [
+                    {'code': code, 'template': template, 'repeats': repeats}
+                    for (code, template), repeats
+                    in self.locations[key].items()
+                ],
+            }
+            for key, count in self.counts.items() if count >= limit
+        ]
+
+
+def locate():
+    """Строка кода проекта и узел шаблона, из которых пришёл запрос."""
+    code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and (code is None or template is None):
+        node = frame.f_locals.get('self')
+        if (template is None and isinstance(node, Node)
+                and getattr(node, 'token', None) is not None
+                and getattr(node, 'origin', None) is not None):
+            name = node.origin.template_name or node.origin.name
+            template = f'{name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(settings.BASE_DIR)
+                and filename not in SKIP_FILES):
+            code = (f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                    f'{frame.f_lineno} {frame.f_code.co_name}')
+        frame = frame.f_back
+    return code, template
+
+
+def current():
+    return getattr(_state, 'audit', None)
+
+
+def report(finding):
+    logger.warning(json.dumps(finding, ensure_ascii=False, default=str),
+                   extra={'query_audit': finding})
+
+
+def audit_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        audit = current()
+        if audit is not None and not TRANSACTION_RE.match(sql):
+            audit.seen(sql)
+        if elapsed >= slow_ms():
+            code, template = locate()
+            finding = {
+                'kind': 'slow',
+                'view': audit.view if audit else None,
+                'path': audit.path if audit else None,
+                'sql': sql,
+                'ms': round(elapsed, 1),
+                'code': code,
+                'template': template,
+            }
+            report(finding)
+            if audit is not None:
+                audit.findings.append(finding)
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает аудит к соединению."""
+    # В начало списка: execute_wrapper() снимает обёртки с конца
+    if audit_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, audit_query)
+
+
+def start_request_audit(sender, environ=None, **kwargs):
+    path = (environ or {}).get('PATH_INFO', '')
+    _state.audit = RequestAudit(path)
+
+
+def finish_request_audit(sender, **kwargs):
+    audit = current()
+    _state.audit = None
+    if audit is None:
+        return
+    duplicates = audit.duplicates()
+    for finding in duplicates:
+        report(finding)
+    findings = audit.findings + duplicates
+    if findings and is_strict():
+        raise QueryAuditError(
+            json.dumps(findings, ensure_ascii=False, indent=2, default=str)
+        )
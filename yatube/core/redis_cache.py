@@ -0,0 +1,8 @@
+"""Redis через django-redis со счётчиками попаданий для профилирования."""
+from django_redis.cache import RedisCache as BaseRedisCache
+
+from .profiling import CountingCacheMixin
+
+
+class RedisCache(CountingCacheMixin, BaseRedisCache):
+    pass
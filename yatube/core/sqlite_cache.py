@@ -0,0 +1,211 @@
+"""
+Кеш в файле SQLite, общий для всех процессов на машине.
+
+Нужен, когда несколько воркеров gunicorn должны видеть одни и те же
+записи и сбросы версий page_cache, а сервера Redis или Memcached нет.
+Каждый поток держит своё соединение с файлом LOCATION; журнал WAL
+позволяет читать, пока другой процесс пишет. Целые числа хранятся как
+INTEGER, и incr - одна команда UPDATE, атомарная между процессами;
+остальные значения хранятся в pickle. Раз в CULL_EVERY записей
+удаляются просроченные записи и, сверх MAX_ENTRIES, те, что истекают
+раньше других.
+"""
+import os
+import pickle
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+# Ограничение SQLite на число параметров запроса
+CHUNK = 500
+INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def encode(value):
+    if type(value) is int and value in INT_RANGE:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+def chunks(items):
+    for start in range(0, len(items), CHUNK):
+        yield items[start:start + CHUNK]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        options = params.get('OPTIONS', {})
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self.busy_timeout = float(options.get('TIMEOUT', 5))
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+
+    @property
+    def connection(self):
+        # После fork соединение родителя не используется
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.location, timeout=self.busy_timeout,
+                isolation_level=None, check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        row = self.connection.execute(
+            f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+            (self.key(key, version), time.time()),
+        ).fetchone()
+        return default if row is None else decode(row[0])
+
+    def get_many(self, keys, version=None):
+        names = {self.key(key, version): key for key in keys}
+        found = {}
+        now = time.time()
+        for chunk in chunks(list(names)):
+            rows = self.connection.execute(
+                f'SELECT key, value FROM cache WHERE key IN '
+                f'({", ".join("?" * len(chunk))}) AND {ALIVE}',
+                (*chunk, now),
+            )
+            for name, value in rows:
+                found[names[name]] = decode(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+            (self.key(key, version), encode(value),
+             self.get_backend_timeout(timeout)),
+        )
+        self.written(1)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self.key(key, version), encode(value), expires)
+                for key, value in data.items()]
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', rows,
+            )
+        self.written(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        # Просроченная запись не мешает добавить новую
+        added = self.connection.execute(
+            'INSERT INTO cache VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE '
+            'SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (self.key(key, version), encode(value),
+             self.get_backend_timeout(timeout), now),
+        ).rowcount
+        self.written(added)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self.connection.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), self.key(key, version),
+             time.time()),
+        ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        name = self.key(key, version)
+        with self.transaction() as connection:
+            updated = connection.execute(
+                f'UPDATE cache SET value = value + ? WHERE key = ? '
+                f"AND typeof(value) = 'integer' AND {ALIVE}",
+                (delta, name, time.time()),
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Key '{key}' not found")
+            return connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (name,),
+            ).fetchone()[0]
+
+    def has_key(self, key, version=None):
+        return self.connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (self.key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self.key(key, version),),
+        )
+
+    def delete_many(self, keys, version=None):
+        names = [self.key(key, version) for key in keys]
+        with self.transaction() as connection:
+            for chunk in chunks(names):
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN '
+                    f'({", ".join("?" * len(chunk))})', chunk,
+                )
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE берёт блокировку записи сразу, до чтения
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def written(self, count):
+        self._writes += count
+        if self._writes >= self.cull_every:
+            self._writes = 0
+            self.cull()
+
+    def cull(self):
+        with self.transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),),
+            )
+            total, = connection.execute(
+                'SELECT COUNT(*) FROM cache',
+            ).fetchone()
+            if total > self._max_entries:
+                # CULL_FREQUENCY = 0 по соглашению Django очищает всё
+                excess = (total // self._cull_frequency
+                          if self._cull_frequency else total)
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)', (excess,),
+                )
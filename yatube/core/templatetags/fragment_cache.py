@@ -0,0 +1,50 @@
+from django import template
+from django.template import NodeList, TemplateSyntaxError
+from django.templatetags.cache import CacheNode
+
+from core.cache_stats import record_fragment
+
+register = template.Library()
+
+
+class RecordingNodeList(NodeList):
+    """Отмечает в render_context, что фрагмент пришлось отрисовать."""
+
+    def render(self, context):
+        context.render_context[id(self)] = True
+        return super().render(context)
+
+
+class CountedCacheNode(CacheNode):
+    def __init__(self, nodelist, *args):
+        super().__init__(RecordingNodeList(nodelist), *args)
+
+    def render(self, context):
+        with context.render_context.push():
+            value = super().render(context)
+            hit = id(self.nodelist) not in context.render_context
+        record_fragment(self.fragment_name, hit)
+        return value
+
+
+@register.tag('counted_cache')
+def do_counted_cache(parser, token):
+    """
+    Как {% cache %}, но считает попадания и промахи по имени фрагмента.
+
+        {% counted_cache [expire_time] [fragment_name] [var1] .. %}
+    """
+    nodelist = parser.parse(('endcounted_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return CountedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(bit) for bit in tokens[3:]],
+        None,
+    )
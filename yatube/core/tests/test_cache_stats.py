@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..cache_stats import fragment_stats, record_fragment
+
+
+class CacheStatsTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_hits_and_misses(self):
+        record_fragment('index_page', False)
+        record_fragment('index_page', True)
+        record_fragment('index_page', True)
+        self.assertEqual(fragment_stats(), {
+            'index_page': {'hits': 2, 'misses': 1, 'hit_rate': 0.667},
+        })
+
+    def test_concurrent_first_records_keep_every_name(self):
+        set_value = cache.set
+
+        def set_after_other_request(*args, **kwargs):
+            # Другой запрос впервые записывает свой фрагмент между
+            # чтением реестра имён и записью в него
+            if not calls:
+                calls.append(args)
+                record_fragment('sidebar', False)
+            return set_value(*args, **kwargs)
+
+        calls = []
+        with mock.patch.object(cache, 'set', set_after_other_request):
+            record_fragment('index_page', False)
+        self.assertEqual(sorted(fragment_stats()), ['index_page', 'sidebar'])
@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from posts.models import Post
+
+from .. import database
+
+User = get_user_model()
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    def test_pragmas_applied_to_new_connection(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory.name, 'pragmas.sqlite3'),
+            'PRAGMAS': {'journal_mode': 'WAL', 'cache_size': -2000},
+        }, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -2000)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = database.ReplicaRouter()
+        database.pin(False)
+        self.addCleanup(database.pin, False)
+
+    def test_feed_reads_go_to_replica(self):
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_reads_after_write_stay_on_primary(self):
+        self.router.db_for_write(User)
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_use_primary(self):
+        with database.use_primary():
+            self.assertIsNone(self.router.db_for_read(Post))
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_reads_primary(self):
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_write_pins_client_to_primary(self):
+        def write(request):
+            self.router.db_for_write(Post)
+            return HttpResponse()
+
+        def read(request):
+            return HttpResponse(self.router.db_for_read(Post) or 'default')
+
+        factory = RequestFactory()
+        response = database.ReplicaPinMiddleware(write)(factory.post('/'))
+        self.assertIn(database.PIN_COOKIE, response.cookies)
+        self.assertFalse(database.is_pinned())
+
+        request = factory.get('/')
+        request.COOKIES[database.PIN_COOKIE] = '1'
+        response = database.ReplicaPinMiddleware(read)(request)
+        self.assertEqual(response.content, b'default')
+        # Чтение без записи не продлевает привязку
+        self.assertNotIn(database.PIN_COOKIE, response.cookies)
+
+        response = database.ReplicaPinMiddleware(read)(factory.get('/'))
+        self.assertEqual(response.content, b'replica')
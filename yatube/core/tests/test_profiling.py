@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import profiling
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Текст')
+        self.staff = User.objects.create_user(username='staff',
+                                              is_staff=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def timing(self, response):
+        return dict(
+            part.strip().split(';', 1)
+            for part in response['Server-Timing'].split(',')
+        )
+
+    @override_settings(PROFILING_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        timing = self.timing(response)
+        self.assertEqual(set(timing), {'db', 'tpl', 'cache', 'total'})
+        self.assertRegex(timing['db'], r'dur=[\d.]+;desc="[1-9]\d* SQL"')
+        self.assertRegex(timing['cache'], r'desc="hit \d+ miss [1-9]\d*"')
+
+    @override_settings(PROFILING_SERVER_TIMING=False)
+    def test_server_timing_only_for_staff(self):
+        url = reverse('posts:index')
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.assertIn('Server-Timing', self.staff_client.get(url))
+
+    def test_view_histograms(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        for _ in range(3):
+            self.client.get(url)
+        self.client.get('/no/such/page/')
+        response = self.staff_client.get(reverse('core:request_stats'))
+        views = response.json()['views']
+        detail = views['posts:post_detail']
+        self.assertEqual(detail['count'], 3)
+        self.assertEqual(sum(detail['histogram'].values()), 3)
+        self.assertGreater(detail['queries_mean'], 0)
+        self.assertGreater(detail['template_ms_mean'], 0)
+        self.assertLessEqual(detail['p50_ms'], detail['max_ms'])
+        self.assertEqual(views[profiling.UNRESOLVED]['count'], 1)
+
+    def test_stats_are_staff_only(self):
+        response = self.client.get(reverse('core:request_stats'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_cache_counts_each_key_once(self):
+        stats = profiling._state.stats = profiling.RequestStats()
+        self.addCleanup(setattr, profiling._state, 'stats', None)
+        cache.set('present', 1)
+        cache.get('present')
+        cache.get('absent')
+        cache.get_many(['present', 'absent', 'other'])
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 3))
@@ -0,0 +1,69 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.template import engines
+from django.test import TestCase, override_settings
+
+from posts.models import Post
+
+from .. import query_audit
+
+User = get_user_model()
+
+
+class QueryAuditTest(TestCase):
+    def setUp(self):
+        for number in range(4):
+            author = User.objects.create_user(username=f'author{number}')
+            Post.objects.create(author=author, text=f'Пост {number}')
+        self.template = engines['django'].from_string(
+            '{% for post in posts %}{{ post.author.username }}{% endfor %}'
+        )
+
+    def run_request(self, job, path='/'):
+        with self.assertLogs('core.query_audit', 'WARNING') as logs:
+            query_audit.start_request_audit(None, {'PATH_INFO': path})
+            try:
+                job()
+            finally:
+                try:
+                    query_audit.finish_request_audit(None)
+                finally:
+                    self.findings = [json.loads(record.getMessage())
+                                     for record in logs.records]
+
+    def test_n_plus_one_is_attributed_to_template_and_code(self):
+        posts = Post.objects.all()
+        self.run_request(lambda: self.template.render({'posts': posts}))
+        finding, = self.findings
+        self.assertEqual(finding['kind'], 'duplicate')
+        self.assertEqual(finding['view'], 'posts:index')
+        self.assertEqual(finding['count'], 4)
+        self.assertIn('auth_user', finding['sql'])
+        location, = finding['locations']
+        self.assertEqual(location['template'], '<unknown source>:1')
+        self.assertRegex(location['code'],
+                         r'^core/tests/test_query_audit\.py:\d+ <lambda>$')
+        self.assertEqual(location['repeats'], 3)
+
+    def test_in_lists_share_shape(self):
+        def job():
+            for size in range(1, 4):
+                list(Post.objects.filter(pk__in=range(size)))
+        self.run_request(job)
+        self.assertEqual(self.findings[0]['count'], 3)
+        self.assertIn('IN (%s...)', self.findings[0]['sql'])
+
+    @override_settings(QUERY_AUDIT_SLOW_MS=0, QUERY_AUDIT_DUPLICATES=100)
+    def test_slow_queries(self):
+        self.run_request(lambda: Post.objects.count())
+        finding, = self.findings
+        self.assertEqual(finding['kind'], 'slow')
+        self.assertIn('COUNT(*)', finding['sql'])
+        self.assertRegex(finding['code'], r'test_query_audit\.py:\d+')
+
+    @override_settings(QUERY_AUDIT_STRICT=True)
+    def test_strict_mode_raises(self):
+        posts = Post.objects.all()
+        with self.assertRaises(query_audit.QueryAuditError):
+            self.run_request(lambda: self.template.render({'posts': posts}))
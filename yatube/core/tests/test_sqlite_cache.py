@@ -0,0 +1,71 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from ..sqlite_cache import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_round_trip(self):
+        self.cache.set('number', 42)
+        self.cache.set('page', {'content': b'<html>', 'versions': {'a': 1}})
+        self.assertEqual(self.cache.get('number'), 42)
+        self.assertEqual(self.cache.get('page')['content'], b'<html>')
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+        self.assertEqual(
+            self.cache.get_many(['number', 'page', 'missing']).keys(),
+            {'number', 'page'},
+        )
+
+    def test_other_instance_sees_writes_and_deletes(self):
+        # Как другой процесс с тем же файлом
+        other = self.make_cache()
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(other.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        other.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_expired_entry_is_missing_and_replaced_by_add(self):
+        self.cache.set('key', 'old', timeout=0.01)
+        time.sleep(0.02)
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr_is_atomic_across_threads(self):
+        self.cache.set('counter', 0)
+
+        def bump():
+            cache = self.make_cache()
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_keeps_max_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_EVERY=5)
+        for number in range(30):
+            cache.set(f'key{number}', number)
+        self.assertLessEqual(
+            len(cache.get_many(f'key{number}' for number in range(30))), 15,
+        )
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+from .apps import CoreConfig
+
+app_name = CoreConfig.name
+
+urlpatterns = [
+    path('cache/', views.cache_stats, name='cache_stats'),
+    path('requests/', views.request_stats, name='request_stats'),
+]
@@ -1,6 +1,11 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 from http import HTTPStatus
 
+from .cache_stats import fragment_stats
+from .profiling import view_stats, window_minutes
+
 
 def page_not_found(request, exception):
     return render(
@@ -25,3 +30,18 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def cache_stats(request):
+    """Попадания и промахи фрагментного кеша для подбора TTL."""
+    return JsonResponse({'fragments': fragment_stats()})
+
+
+@staff_member_required
+def request_stats(request):
+    """Время, SQL, шаблоны и кеш по каждому view за последние минуты."""
+    return JsonResponse({
+        'window_minutes': window_minutes(),
+        'views': view_stats(),
+    })
@@ -1,7 +1,10 @@
 from django.contrib import admin
 
 from core.admin import BaseAdmin
-from .models import Comment, Follow, Group, Post
+from .models import (
+    Comment, Follow, Group, NotificationJob, Post, PostScore,
+)
+from .search import matching
 
 
 @admin.register(Post)
@@ -12,6 +15,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу вместо LIKE '%q%' по всем текстам
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=matching(search_term)), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -37,3 +46,18 @@ class FollowAdmin(BaseAdmin):
     )
     search_fields = ('author',)
     list_filter = ('author',)
+
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'post', 'status', 'sent', 'attempts', 'updated')
+    list_filter = ('status',)
+    raw_id_fields = ('post',)
+    readonly_fields = ('follow_cursor', 'sent', 'attempts', 'error')
+
+
+@admin.register(PostScore)
+class PostScoreAdmin(admin.ModelAdmin):
+    list_display = ('post', 'score')
+    ordering = ('-score',)
+    raw_id_fields = ('post',)
@@ -0,0 +1,214 @@
+"""
+JSON API только для чтения: ленты, пост с комментариями, группы и
+подписки.
+
+Ленты строятся из тех же querysets, что и HTML-страницы, но читаются
+через values(): строки не превращаются в модели, и в SELECT попадают
+только поля из ?fields=. Списки листаются курсором, как ленты
+с ?cursor=, поэтому глубина страницы не влияет на стоимость запроса.
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from .feed import follow_feed
+from .models import Comment, Group, Post, User
+from .utils import CURSOR_PARAM, POST_PAGES, CursorPaginator
+
+FIELDS_PARAM = 'fields'
+
+# Имя поля в ответе: путь для values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'post_count': 'post_count',
+}
+FOLLOW_FIELDS = {
+    'author': 'author__username',
+}
+
+
+class ApiError(Exception):
+    pass
+
+
+def api_view(view):
+    """GET-view, отвечающий JSON и на ошибки."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return error('Не найдено', HTTPStatus.NOT_FOUND)
+        except ApiError as exc:
+            return error(str(exc), HTTPStatus.BAD_REQUEST)
+    return wrapper
+
+
+def respond(data, status=HTTPStatus.OK):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def error(message, status):
+    return respond({'error': message}, status)
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=, по умолчанию все."""
+    raw = request.GET.get(FIELDS_PARAM)
+    if not raw:
+        return list(available)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def serialize(rows, names, available):
+    result = []
+    for row in rows:
+        item = {name: row[available[name]] for name in names}
+        if item.get('image'):
+            item['image'] = default_storage.url(item['image'])
+        result.append(item)
+    return result
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query[CURSOR_PARAM] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def cursor_page(request, queryset, available, field, ascending=False,
+                parse=parse_datetime):
+    """Страница values()-строк с курсором по (field, id)."""
+    names = requested_fields(request, available)
+    # Поля курсора читаются всегда, даже если их не просили
+    paths = {available[name] for name in names} | {field, 'id'}
+    paginator = CursorPaginator(queryset.values(*paths), POST_PAGES, field,
+                                parse=parse, ascending=ascending)
+    page = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    return {
+        'results': serialize(page, names, available),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }
+
+
+def posts_page(request, posts, field='pub_date'):
+    return respond(
+        cursor_page(request, posts.for_feed(), POST_FIELDS, field)
+    )
+
+
+@api_view
+def post_list(request):
+    return posts_page(request, Post.objects.all())
+
+
+@api_view
+def group_post_list(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return posts_page(request, group.posts.all())
+
+
+@api_view
+def profile_post_list(request, username):
+    author = get_object_or_404(User, username=username)
+    return posts_page(request, author.posts.all())
+
+
+@api_view
+def follow_post_list(request):
+    if not request.user.is_authenticated:
+        return error('Требуется вход', HTTPStatus.UNAUTHORIZED)
+    return posts_page(request, follow_feed(request.user), 'feed_date')
+
+
+@api_view
+def post_detail(request, post_id):
+    names = requested_fields(request, POST_FIELDS)
+    post = Post.objects.for_feed().filter(pk=post_id).values(
+        *{POST_FIELDS[name] for name in names}
+    ).first()
+    if post is None:
+        raise Http404
+    data = serialize([post], names, POST_FIELDS)[0]
+    comments = Comment.objects.filter(post_id=post_id)
+    paginator = CursorPaginator(
+        comments.values(*COMMENT_FIELDS.values()), POST_PAGES, 'created',
+        ascending=True,
+    )
+    page = paginator.get_page()
+    data['comments'] = serialize(page, list(COMMENT_FIELDS), COMMENT_FIELDS)
+    data['comments_next'] = None
+    if page.next_cursor is not None:
+        url = reverse('posts:api_comment_list', args=(post_id,))
+        data['comments_next'] = request.build_absolute_uri(
+            f'{url}?{CURSOR_PARAM}={page.next_cursor}'
+        )
+    return respond(data)
+
+
+@api_view
+def comment_list(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return respond(cursor_page(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        'created', ascending=True,
+    ))
+
+
+@api_view
+def group_list(request):
+    posts = Post.objects.filter(group=OuterRef('pk')).order_by().values(
+        'group',
+    ).annotate(total=Count('pk'))
+    groups = Group.objects.annotate(
+        post_count=Coalesce(F('posts_count'),
+                            Subquery(posts.values('total')), 0,
+                            output_field=IntegerField()),
+    )
+    return respond(cursor_page(request, groups, GROUP_FIELDS, 'id',
+                               ascending=True, parse=int))
+
+
+@api_view
+def follow_list(request):
+    if not request.user.is_authenticated:
+        return error('Требуется вход', HTTPStatus.UNAUTHORIZED)
+    return respond(cursor_page(
+        request, request.user.follower.all(), FOLLOW_FIELDS,
+        'author__username', ascending=True, parse=str,
+    ))
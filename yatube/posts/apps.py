@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     name = 'posts'
     pages_on_list = 10
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,113 @@
+"""
+Фоновые задачи в пулах потоков.
+
+Pool - пул на весь процесс, в который запросы после коммита ставят
+задачи (миниатюры, рассылки). Число потоков берётся из настройки; 0 -
+задача выполняется сразу, в текущем потоке. run_each - разовый пул
+команды управления. Задача в потоке пула сама открывает и закрывает
+соединения с базой, а её ошибка пишется в журнал или передаётся
+команде и не останавливает остальные задачи.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+
+class Pool:
+    def __init__(self, name, setting, logger, error_message):
+        self.name = name
+        self.setting = setting
+        self.logger = logger
+        # Сообщение в журнал об ошибке задачи, %s - её ключ
+        self.error_message = error_message
+        self._lock = threading.Lock()
+        # Ключ задачи -> Future, пока задача не выполнена
+        self._pending = {}
+        self._executor = None
+
+    def workers(self):
+        return getattr(settings, self.setting, 2)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers(), thread_name_prefix=self.name,
+                )
+            return self._executor
+
+    def _call(self, key, job, *args, **kwargs):
+        try:
+            job(*args, **kwargs)
+        except Exception:
+            self.logger.exception(self.error_message, key)
+
+    def _work(self, key, job, *args, **kwargs):
+        close_old_connections()
+        try:
+            self._call(key, job, *args, **kwargs)
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def submit(self, key, job, *args, **kwargs):
+        """
+        Ставит job(*args, **kwargs) в пул. Задача с тем же ключом, ещё
+        не выполненная, второй раз не ставится.
+        """
+        if not self.workers():
+            self._call(key, job, *args, **kwargs)
+            return
+        executor = self._get_executor()
+        with self._lock:
+            if key in self._pending:
+                return
+            # Под блокировкой: _work снимет ключ только после записи
+            self._pending[key] = executor.submit(
+                self._work, key, job, *args, **kwargs
+            )
+
+    def drain(self, timeout=None):
+        """Дожидается всех поставленных задач."""
+        with self._lock:
+            futures = list(self._pending.values())
+        wait(futures, timeout=timeout)
+
+
+def _run_threaded(job, item):
+    close_old_connections()
+    try:
+        job(item)
+    finally:
+        # Поток пула завершится вместе с командой, и его соединения
+        # не вернутся в пул и не закроются сами
+        connections.close_all()
+
+
+def run_each(job, items, workers, on_error):
+    """
+    Выполняет job(item) для каждого элемента в workers потоках, при 0 -
+    по очереди в текущем. Ошибка передаётся в on_error(item, error).
+    Возвращает число выполненных задач и число ошибок.
+    """
+    def run(item):
+        try:
+            if workers:
+                _run_threaded(job, item)
+            else:
+                job(item)
+        except Exception as error:
+            on_error(item, error)
+            return False
+        return True
+
+    if workers:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, items))
+    else:
+        results = [run(item) for item in items]
+    failed = results.count(False)
+    return len(results) - failed, failed
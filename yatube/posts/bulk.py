@@ -0,0 +1,50 @@
+"""Помощники для массовой записи постов через bulk_create."""
+from itertools import islice
+
+from django.db import connections
+from django.db.models import Max
+
+from .models import Post
+
+BATCH_SIZE = 1000
+
+
+def batches(items, size):
+    """Разбивает итерируемое на списки по size элементов."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert(posts):
+    created = Post.objects.bulk_create(posts)
+    if created and created[0].pk is None:
+        # SQLite не возвращает id из bulk_create. Строки одной команды
+        # INSERT получают подряд идущие id, а до конца транзакции её
+        # блокировка записи не пускает чужие строки
+        last = Post.objects.aggregate(last=Max('pk'))['last']
+        for pk, post in enumerate(created, last - len(created) + 1):
+            post.pk = pk
+    return created
+
+
+def create_posts(posts):
+    """
+    bulk_create для постов с уже заданным pub_date; вызывается в
+    транзакции. auto_now_add заменяет дату временем вставки, поэтому
+    после неё даты возвращаются bulk_update по id новых постов.
+    Возвращает посты с проставленными id.
+    """
+    dates = [post.pub_date for post in posts]
+    ops = connections[Post.objects.db].ops
+    size = max(ops.bulk_batch_size(Post._meta.concrete_fields, posts), 1)
+    created = []
+    for batch in batches(posts, size):
+        created.extend(_insert(batch))
+    for post, pub_date in zip(created, dates):
+        post.pub_date = pub_date
+    Post.objects.bulk_update(created, ['pub_date'])
+    return created
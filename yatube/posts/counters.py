@@ -0,0 +1,126 @@
+"""
+Денормализованные счётчики постов и комментариев.
+
+Счётчики хранятся в колонках Group.posts_count, Post.comments_count и
+в таблице UserStats. NULL означает «ещё не посчитан»: такой счётчик
+вычисляется при первом чтении, а сигналы меняют только уже
+посчитанные значения. Поэтому bulk_create и прочие обходы сигналов
+не ломают счётчики, которые ещё никто не читал, а накопившийся дрейф
+исправляет команда rebuild_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _add(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.filter(**{f'{field}__isnull': False}).update(
+        **{field: F(field) + delta}
+    )
+
+
+def _read(instance, field, compute):
+    value = getattr(instance, field)
+    if value is None:
+        value = compute()
+        type(instance).objects.filter(pk=instance.pk).update(
+            **{field: value}
+        )
+        setattr(instance, field, value)
+    return value
+
+
+def add_author_posts(author_id, delta):
+    _add(UserStats.objects.filter(user_id=author_id), 'posts_count', delta)
+
+
+def add_group_posts(group_id, delta):
+    if group_id is not None:
+        _add(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def add_author_followers(author_id, delta):
+    _add(UserStats.objects.filter(user_id=author_id), 'followers_count',
+         delta)
+
+
+def add_user_following(user_id, delta):
+    _add(UserStats.objects.filter(user_id=user_id), 'following_count',
+         delta)
+
+
+def add_post_comments(post_id, delta):
+    _add(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def get_user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(user=user)
+        user.stats = stats
+        return stats
+
+
+def author_posts_count(author):
+    return _read(get_user_stats(author), 'posts_count',
+                 lambda: Post.objects.filter(author=author).count())
+
+
+def author_followers_count(author_id):
+    stats, _ = UserStats.objects.get_or_create(user_id=author_id)
+    return _read(stats, 'followers_count',
+                 lambda: Follow.objects.filter(author_id=author_id).count())
+
+
+def user_followers_count(user):
+    return _read(get_user_stats(user), 'followers_count',
+                 lambda: Follow.objects.filter(author=user).count())
+
+
+def user_following_count(user):
+    return _read(get_user_stats(user), 'following_count',
+                 lambda: Follow.objects.filter(user=user).count())
+
+
+def group_posts_count(group):
+    return _read(group, 'posts_count',
+                 lambda: Post.objects.filter(group=group).count())
+
+
+def post_comments_count(post):
+    return _read(post, 'comments_count',
+                 lambda: Comment.objects.filter(post=post).count())
+
+
+def _count_of(queryset, field, outer='pk'):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def rebuild_counters():
+    """Пересчитывает все счётчики коррелированными UPDATE-запросами."""
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk)
+         for pk in User.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        posts_count=_count_of(Post.objects, 'author', 'user'),
+        followers_count=_count_of(Follow.objects, 'author', 'user'),
+        following_count=_count_of(Follow.objects, 'user', 'user'),
+    )
+    Group.objects.update(posts_count=_count_of(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count_of(Comment.objects, 'post'))
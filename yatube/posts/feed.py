@@ -0,0 +1,196 @@
+"""
+Лента подписок с рассылкой при записи (fan-out-on-write).
+
+Новый пост сразу раскладывается в таблицу FeedEntry всем подписчикам
+автора, и страница ленты читается из FeedEntry по индексу
+(user, -pub_date), а посты подгружаются по её строкам, без соединения
+Follow со всей таблицей постов. Когда подписчиков у автора становится
+больше FEED_FANOUT_MAX_FOLLOWERS, он помечается UserStats.feed_read_time:
+его посты больше не рассылаются, а добавляются в ленту при чтении
+(fan-out-on-read). Обратно автора переводит команда materialize_feeds,
+когда подписчиков становится меньше порога с запасом
+FEED_MATERIALIZE_RATIO: заполнение лент всех подписчиков не делается
+в запросе отписки и не повторяется при подписках туда-обратно у порога.
+
+Отрисованная лента кешируется фрагментом с ключом по пользователю и
+версиям его областей: follow:<id> сбрасывается при подписке, отписке и
+рассылке поста, author:<id> - при изменении постов автора,
+читаемого на лету.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+
+from . import page_cache
+from .counters import author_followers_count
+from .models import FeedEntry, Follow, Post, UserStats
+
+BATCH_SIZE = 1000
+
+
+def fanout_limit():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 1000)
+
+
+def materialize_limit():
+    ratio = getattr(settings, 'FEED_MATERIALIZE_RATIO', 0.9)
+    return int(fanout_limit() * ratio)
+
+
+def is_fanout_author(author_id):
+    return not UserStats.objects.filter(
+        user_id=author_id, feed_read_time=True,
+    ).exists()
+
+
+def follower_added(author_id):
+    """Переводит автора на чтение на лету, когда он перерос порог."""
+    if author_followers_count(author_id) > fanout_limit():
+        UserStats.objects.filter(
+            user_id=author_id, feed_read_time=False,
+        ).update(feed_read_time=True)
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True)
+    _insert(
+        FeedEntry(user_id=user_id, post_id=post.pk,
+                  author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_posts(posts):
+    """
+    Раскладывает посты из queryset posts в ленты подписчиков их
+    авторов одной командой INSERT ... SELECT, пропуская авторов,
+    читаемых на лету, и уже разложенные записи. Для массовой вставки
+    без сигналов, когда fan_out_post по одному посту слишком дорог.
+    """
+    db = posts.db
+    ops = connections[db].ops
+    entry, post = FeedEntry._meta, Post._meta
+    follow, stats = Follow._meta, UserStats._meta
+    ids, params = posts.values('pk').query.sql_with_params()
+    with connections[db].cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{entry.db_table} (user_id, post_id, author_id, pub_date) '
+            'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {post.db_table} p '
+            f'INNER JOIN {follow.db_table} f ON f.author_id = p.author_id '
+            f'WHERE p.id IN ({ids}) AND NOT EXISTS ('
+            f'SELECT 1 FROM {stats.db_table} s '
+            'WHERE s.user_id = p.author_id AND s.feed_read_time) '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            params,
+        )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика уже написанные посты автора."""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date',
+    )
+    _insert(
+        FeedEntry(user_id=user_id, post_id=post_id,
+                  author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def backfill_followers(author_id):
+    """Заполняет ленты всех подписчиков автора, которого рассылают."""
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True,
+    )
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def materialize(author_id):
+    """Возвращает автора к рассылке и заполняет ленты его подписчиков."""
+    UserStats.objects.filter(user_id=author_id).update(feed_read_time=False)
+    backfill_followers(author_id)
+    invalidate_author(author_id)
+
+
+def read_time_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются на лету."""
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__feed_read_time=True,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def follow_feed(user, authors=None):
+    """
+    Посты ленты подписок пользователя, упорядоченные по feed_date.
+    Без авторов на лету порядок и фильтр берутся из FeedEntry.
+    """
+    if authors is None:
+        authors = read_time_authors(user)
+    if not authors:
+        return Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+        ).order_by('-feed_date', '-pk')
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=authors),
+    ).annotate(feed_date=F('pub_date')).order_by('-feed_date', '-pk')
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def feed_version(user, authors):
+    """Версия закешированной ленты подписок пользователя."""
+    scopes = [follow_scope(user.pk)] + [author_scope(a) for a in authors]
+    versions = page_cache.current_versions(scopes)
+    return ':'.join(versions[scope] for scope in scopes)
+
+
+def invalidate_reader(user_id):
+    page_cache.invalidate(follow_scope(user_id))
+
+
+def invalidate_author(author_id):
+    """Сбрасывает кешированные ленты, в которых есть посты автора."""
+    page_cache.invalidate(author_scope(author_id))
+    if not is_fanout_author(author_id):
+        return
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True,
+    )
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(follow_scope(user_id))
+        if len(batch) == BATCH_SIZE:
+            page_cache.invalidate(*batch)
+            batch = []
+    if batch:
+        page_cache.invalidate(*batch)
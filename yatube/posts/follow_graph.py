@@ -0,0 +1,178 @@
+"""
+Граф подписок из кеша.
+
+Для каждого пользователя кеш хранит frozenset id авторов, на которых он
+подписан. Проверка подписки - одно обращение к кешу; промах читает
+подписки пользователя одним запросом по индексу user_author. Числа
+подписчиков и подписок - счётчики UserStats.
+
+follow и unfollow находят автора по имени и меняют подписку одной
+командой SQL: INSERT ... ON CONFLICT DO NOTHING и DELETE, обе с
+RETURNING. Повторный щелчок ничего не меняет и не натыкается на
+уникальность user_author. Если подписка действительно изменилась,
+в той же транзакции меняются счётчики и лента подписок, а после неё
+закешированное множество обновляется на месте (write-through) и
+сбрасываются страницы профилей. Подписки через ORM проходят тот же
+путь по сигналам. RETURNING есть в SQLite только с версии 3.35: со
+старой библиотекой команда выполняется без него, изменение видно по
+cursor.rowcount, а id автора читается вторым запросом.
+"""
+import sqlite3
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from . import counters, feed, page_cache
+from .models import Follow, User
+
+FOLLOW_SQL = (
+    'INSERT INTO {follow} (user_id, author_id) '
+    'SELECT %s, id FROM {user} WHERE username = %s AND id <> %s '
+    'ON CONFLICT DO NOTHING'
+)
+UNFOLLOW_SQL = (
+    'DELETE FROM {follow} WHERE user_id = %s AND author_id = '
+    '(SELECT id FROM {user} WHERE username = %s)'
+)
+RETURNING_SQL = ' RETURNING author_id'
+AUTHOR_SQL = 'SELECT id FROM {user} WHERE username = %s'
+
+SQLITE_RETURNING_VERSION = (3, 35)
+
+
+def can_return():
+    return (connection.vendor != 'sqlite'
+            or sqlite3.sqlite_version_info >= SQLITE_RETURNING_VERSION)
+
+
+def cache_timeout():
+    return getattr(settings, 'FOLLOW_GRAPH_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _key(user_id):
+    return f'follow_graph:following:{user_id}'
+
+
+def following_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь."""
+    key = _key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True,
+        ))
+        cache.set(key, ids, cache_timeout())
+    return ids
+
+
+def is_following(user, author_id):
+    if not user.is_authenticated:
+        return False
+    return author_id in following_ids(user.pk)
+
+
+def _update(user_id, change):
+    # Нет в кеше - нечего обновлять: следующее чтение возьмёт из базы.
+    # Одновременные подписки одного пользователя из разных процессов
+    # могут потерять одно изменение до истечения cache_timeout
+    key = _key(user_id)
+    ids = cache.get(key)
+    if ids is not None:
+        cache.set(key, change(ids), cache_timeout())
+
+
+def _change(sql, params, save, cached, user, username):
+    tables = {
+        name: connection.ops.quote_name(model._meta.db_table)
+        for name, model in (('follow', Follow), ('user', User))
+    }
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if can_return():
+                cursor.execute((sql + RETURNING_SQL).format(**tables), params)
+                row = cursor.fetchone()
+            else:
+                cursor.execute(sql.format(**tables), params)
+                row = None
+                if cursor.rowcount:
+                    cursor.execute(AUTHOR_SQL.format(**tables), (username,))
+                    row = cursor.fetchone()
+        if row is not None:
+            save(user.pk, row[0])
+    if row is None:
+        # Подписка не изменилась; отличить 404 стоит ещё одного запроса
+        if not User.objects.filter(username=username).exists():
+            raise User.DoesNotExist(username)
+        return False
+    cached(user.pk, row[0], (user.username, username))
+    return True
+
+
+def follow(user, username):
+    """
+    Подписывает user на автора username. True - подписка появилась,
+    False - уже была или это сам user; User.DoesNotExist - нет автора.
+    """
+    return _change(FOLLOW_SQL, (user.pk, username, user.pk),
+                   _save_follow, _cached_follow, user, username)
+
+
+def unfollow(user, username):
+    """Отписывает user от автора; True - подписка была и удалена."""
+    return _change(UNFOLLOW_SQL, (user.pk, username),
+                   _save_unfollow, _cached_unfollow, user, username)
+
+
+def _save_follow(user_id, author_id):
+    counters.add_author_followers(author_id, 1)
+    counters.add_user_following(user_id, 1)
+    feed.follower_added(author_id)
+    feed.backfill(user_id, author_id)
+
+
+def _save_unfollow(user_id, author_id):
+    # Автор, опустившийся ниже порога, остаётся на лету до
+    # materialize_feeds: лента подписчиков не заполняется в запросе
+    counters.add_author_followers(author_id, -1)
+    counters.add_user_following(user_id, -1)
+    feed.prune(user_id, author_id)
+
+
+def _invalidate_pages(user_id, author_id, usernames):
+    feed.invalidate_reader(user_id)
+    if usernames is None:
+        usernames = User.objects.filter(
+            pk__in=(user_id, author_id),
+        ).values_list('username', flat=True)
+    # Профили обоих показывают числа подписчиков и подписок
+    page_cache.invalidate(*map(page_cache.profile_scope, usernames))
+
+
+def _cached_follow(user_id, author_id, usernames=None):
+    _update(user_id, lambda ids: ids | {author_id})
+    _invalidate_pages(user_id, author_id, usernames)
+
+
+def _cached_unfollow(user_id, author_id, usernames=None):
+    _update(user_id, lambda ids: ids - {author_id})
+    _invalidate_pages(user_id, author_id, usernames)
+
+
+def follow_created(user_id, author_id):
+    """Последствия подписки, созданной через ORM."""
+    _save_follow(user_id, author_id)
+    _cached_follow(user_id, author_id)
+
+
+def follow_deleted(user_id, author_id):
+    _save_unfollow(user_id, author_id)
+    _cached_unfollow(user_id, author_id)
+
+
+def followers_count(user):
+    return counters.user_followers_count(user)
+
+
+def following_count(user):
+    return counters.user_following_count(user)
@@ -1,7 +1,7 @@
 from django import forms
 from django.forms import ModelForm
 
-from .models import Post, Comment, Follow
+from .models import Post, Comment, Follow, Group
 
 
 class PostForm(forms.ModelForm):
@@ -28,3 +28,11 @@ class FollowForm(ModelForm):
         model = Follow
         labels = {'user': 'Подписка на:', 'author': 'Автор записи'}
         fields = ['user']
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, to_field_name='slug',
+        label='Группа', empty_label='Все группы',
+    )
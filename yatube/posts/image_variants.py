@@ -0,0 +1,110 @@
+"""
+Адаптивные варианты картинок постов.
+
+Для каждой картинки готовятся копии нескольких ширин с пропорциями
+миниатюры ленты в WebP (если его поддерживает Pillow) и в JPEG. Файлы
+лежат рядом с исходной картинкой, а ленты выводят их в <picture> со
+srcset, чтобы браузер сам выбрал самый лёгкий подходящий файл.
+"""
+import os
+from collections import defaultdict
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .models import PostImageVariant
+
+VARIANT_WIDTHS = (320, 640, 960)
+# Пропорции миниатюры ленты 960x339
+ASPECT = 339 / 960
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+ENCODERS = {
+    'webp': ('WEBP', 'webp', {'quality': 75, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 80, 'optimize': True,
+                             'progressive': True}),
+}
+
+
+def variant_formats():
+    """Форматы в порядке предпочтения: первый подходящий выберет браузер."""
+    if features.check('webp'):
+        return ('webp', 'jpeg')
+    return ('jpeg',)
+
+
+def variant_widths(source_width):
+    """Ширины без увеличения картинки; самая узкая нужна всегда."""
+    widths = [width for width in VARIANT_WIDTHS if width <= source_width]
+    return widths or VARIANT_WIDTHS[:1]
+
+
+def variant_name(name, width, format):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{width}w.{ENCODERS[format][1]}'
+
+
+def encode(image, width, format):
+    pil_format, _, options = ENCODERS[format]
+    resized = ImageOps.fit(image, (width, round(width * ASPECT)),
+                           Image.LANCZOS)
+    content = BytesIO()
+    resized.save(content, pil_format, **options)
+    return content.getvalue()
+
+
+def delete_variants(post):
+    # Файлы удаляет сигнал post_delete варианта
+    PostImageVariant.objects.filter(post=post).delete()
+
+
+def generate_variants(post):
+    """Пересоздаёт варианты картинки поста и возвращает их."""
+    delete_variants(post)
+    if not post.image:
+        return []
+    with post.image.open() as source:
+        image = ImageOps.exif_transpose(Image.open(source)).convert('RGB')
+    variants = []
+    for format in variant_formats():
+        for width in variant_widths(image.width):
+            data = encode(image, width, format)
+            name = default_storage.save(
+                variant_name(post.image.name, width, format),
+                ContentFile(data),
+            )
+            variants.append(PostImageVariant(
+                post=post, width=width, format=format, image=name,
+                size=len(data),
+            ))
+    return PostImageVariant.objects.bulk_create(variants)
+
+
+def attach_sources(posts):
+    """
+    Проставляет постам image_sources - список <source> для <picture>
+    с srcset по форматам. Все варианты страницы читаются одним запросом.
+    """
+    with_images = [post.pk for post in posts if post.image]
+    for post in posts:
+        post.image_sources = []
+    if not with_images:
+        return posts
+    srcsets = defaultdict(lambda: defaultdict(list))
+    variants = PostImageVariant.objects.filter(
+        post_id__in=with_images,
+    ).values_list('post_id', 'format', 'width', 'image')
+    for post_id, format, width, name in variants:
+        srcsets[post_id][format].append(
+            f'{default_storage.url(name)} {width}w'
+        )
+    for post in posts:
+        formats = srcsets.get(post.pk, {})
+        post.image_sources = [
+            {'type': f'image/{format}', 'srcset': ', '.join(formats[format]),
+             'sizes': SIZES}
+            for format in variant_formats() if format in formats
+        ]
+    return posts
@@ -0,0 +1,170 @@
+import json
+import logging
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import profiling
+from posts import page_cache
+from posts.models import Post
+
+from .benchmark_urls import Command as BenchmarkUrlsCommand
+
+# Сколько ждать остальные процессы на каждом этапе, с
+STAGE_TIMEOUT = 600
+
+
+class Command(BenchmarkUrlsCommand):
+    help = (
+        'Обходит адреса posts анонимно из нескольких процессов с общим '
+        'кешем и показывает долю попаданий в кеш и страниц, отданных '
+        'из него. Затем сбрасывает версии страниц в главном процессе и '
+        'проверяет, что сброс увидели все. Кеш перед замером очищается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Число процессов, как воркеров gunicorn')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на процесс')
+        parser.add_argument('--only', nargs='+', metavar='NAME',
+                            help='Имена адресов, например index post_detail')
+        parser.add_argument('--username', help='Автор для адресов профиля')
+        parser.add_argument('--slug', help='Группа для адресов группы')
+        parser.add_argument('--post-id', type=int)
+        parser.add_argument('--json', help='Куда записать результаты')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть не меньше 1')
+        if not Post.objects.exists():
+            raise CommandError('Нет постов: сначала seed_benchmark_data')
+        urls = list(self.urls(self.params(options), options['only']))
+        if not urls:
+            raise CommandError('Нет адресов для замера')
+        cache.clear()
+        # Дочерние процессы откроют свои соединения
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(options['workers'] + 1,
+                                  timeout=STAGE_TIMEOUT)
+        queue = context.Queue()
+        processes = [
+            context.Process(target=self.work,
+                            args=(number, urls, options, barrier, queue))
+            for number in range(options['workers'])
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        try:
+            barrier.wait()
+            page_cache.invalidate(page_cache.GLOBAL_SCOPE)
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        rows = sorted((queue.get(timeout=STAGE_TIMEOUT) for _ in processes),
+                      key=lambda row: row['worker'])
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        errors = [row for row in rows if 'error' in row]
+        if errors:
+            raise CommandError(
+                '; '.join(f'процесс {row["worker"]}: {row["error"]}'
+                          for row in errors)
+            )
+        summary = self.report(rows, options, elapsed)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump({'summary': summary, 'workers': rows}, output,
+                          indent=2, ensure_ascii=False)
+
+    def work(self, number, urls, options, barrier, queue):
+        # Ответы 401 и 404 анониму ожидаемы и только засоряют вывод
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        try:
+            profiling.reset()
+            client = Client()
+            from_cache = 0
+            for step in range(options['requests']):
+                name, url, data = urls[(step + number) % len(urls)]
+                with CaptureQueriesContext(connection) as captured:
+                    self.fetch(client, url, data)
+                # Страница из кеша не обращается к базе
+                from_cache += not captured.captured_queries
+            stats = profiling.view_stats().values()
+            hits = sum(row['cache_hits'] for row in stats)
+            misses = sum(row['cache_misses'] for row in stats)
+            barrier.wait()
+            # Главный процесс сбрасывает версии страниц
+            barrier.wait()
+            with CaptureQueriesContext(connection) as captured:
+                client.get(reverse('posts:index'))
+            queue.put({
+                'worker': number,
+                'requests': options['requests'],
+                'cache_hits': hits,
+                'cache_misses': misses,
+                'pages_from_cache': from_cache,
+                'stale_after_invalidate': not captured.captured_queries,
+            })
+        except Exception as error:
+            barrier.abort()
+            queue.put({'worker': number, 'error': repr(error)})
+        finally:
+            connections.close_all()
+
+    def report(self, rows, options, elapsed):
+        self.stdout.write(
+            f'Процессов: {options["workers"]}, запросов на процесс: '
+            f'{options["requests"]}, кеш: '
+            f'{settings.CACHES["default"]["BACKEND"]}'
+        )
+        self.stdout.write(
+            f'{"процесс":<9}{"попаданий":>11}{"промахов":>10}{"доля":>7}'
+            f'{"страниц из кеша":>17}{"сброс виден":>13}'
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["worker"]:<9}{row["cache_hits"]:>11}'
+                f'{row["cache_misses"]:>10}{self.rate(row):>7.1%}'
+                f'{row["pages_from_cache"] / row["requests"]:>17.1%}'
+                f'{"нет" if row["stale_after_invalidate"] else "да":>13}'
+            )
+        total = {
+            'cache_hits': sum(row['cache_hits'] for row in rows),
+            'cache_misses': sum(row['cache_misses'] for row in rows),
+        }
+        summary = {
+            'backend': settings.CACHES['default']['BACKEND'],
+            'workers': options['workers'],
+            'requests': options['requests'] * options['workers'],
+            'hit_rate': round(self.rate(total), 3),
+            'pages_from_cache': round(
+                sum(row['pages_from_cache'] for row in rows)
+                / (options['requests'] * options['workers']), 3,
+            ),
+            'stale_workers': sum(row['stale_after_invalidate']
+                                 for row in rows),
+            'seconds': round(elapsed, 2),
+        }
+        self.stdout.write(
+            f'Итого: доля попаданий {summary["hit_rate"]:.1%}, страниц '
+            f'из кеша {summary["pages_from_cache"]:.1%}, не увидели сброс '
+            f'{summary["stale_workers"]} из {options["workers"]}, '
+            f'за {elapsed:.1f} с'
+        )
+        return summary
+
+    def rate(self, row):
+        total = row['cache_hits'] + row['cache_misses']
+        return row['cache_hits'] / total if total else 0.0
@@ -0,0 +1,98 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import image_variants, thumbnails
+from posts.models import Post, PostImageVariant
+from posts.utils import POST_PAGES
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает, сколько байт картинок отдаёт первая страница ленты: '
+        'одна миниатюра 960x339 против выбора браузером из srcset'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viewports', type=int_list,
+                            default=[360, 768, 1280],
+                            help='Ширины экранов в CSS-пикселях')
+        parser.add_argument('--dpr', type=int_list, default=[1, 2],
+                            help='Плотности пикселей экрана')
+        parser.add_argument('--page-size', type=int, default=POST_PAGES)
+        parser.add_argument('--json', help='Куда записать результаты')
+
+    def handle(self, *args, **options):
+        posts = [post for post in
+                 Post.objects.for_feed()[:options['page_size']]
+                 if post.image]
+        # Миниатюры и варианты, которых нет, готовятся здесь же
+        before = {post.pk: self.thumbnail_size(post) for post in posts}
+        for post in posts:
+            if not post.image_variants.exists():
+                image_variants.generate_variants(post)
+        rows = PostImageVariant.objects.filter(
+            post__in=posts,
+        ).values_list('post_id', 'format', 'width', 'size')
+        variants = defaultdict(list)
+        for post_id, format, width, size in rows:
+            variants[post_id].append((format, width, size))
+        widest = max(image_variants.VARIANT_WIDTHS)
+        results = []
+        for viewport in options['viewports']:
+            for dpr in options['dpr']:
+                needed = min(viewport, widest) * dpr
+                after = sum(
+                    self.pick(variants[post.pk], needed) or before[post.pk]
+                    for post in posts
+                )
+                results.append({
+                    'viewport': viewport,
+                    'dpr': dpr,
+                    'before_bytes': sum(before.values()),
+                    'after_bytes': after,
+                })
+        self.report(len(posts), results)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump({'posts': len(posts), 'results': results},
+                          output, indent=2)
+
+    def thumbnail_size(self, post):
+        thumbnail = thumbnails.generate_feed(post.image.name)
+        return default.storage.size(thumbnail.name)
+
+    def pick(self, variants, needed):
+        """Размер файла, который браузер возьмёт из srcset."""
+        for format in image_variants.variant_formats():
+            candidates = sorted(
+                (width, size) for variant_format, width, size in variants
+                if variant_format == format
+            )
+            if not candidates:
+                continue
+            for width, size in candidates:
+                if width >= needed:
+                    return size
+            return candidates[-1][1]
+        return None
+
+    def report(self, count, results):
+        self.stdout.write(f'Постов с картинками на странице: {count}')
+        self.stdout.write(
+            f'{"экран":>8}{"dpr":>5}{"до, КБ":>10}{"после, КБ":>11}'
+            f'{"экономия":>10}'
+        )
+        for row in results:
+            before, after = row['before_bytes'], row['after_bytes']
+            saving = 1 - after / before if before else 0
+            self.stdout.write(
+                f'{row["viewport"]:>8}{row["dpr"]:>5}{before / 1024:>10.1f}'
+                f'{after / 1024:>11.1f}{saving:>10.0%}'
+            )
@@ -0,0 +1,212 @@
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Comment, Follow, Post
+
+# Схема до миграции 0011: только индексы внешних ключей
+BASE_SCHEMA = (
+    'CREATE TABLE posts_post (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'text TEXT NOT NULL, pub_date DATETIME NOT NULL, '
+    'author_id INTEGER NOT NULL, group_id INTEGER NULL, '
+    'image VARCHAR(100) NULL)',
+    'CREATE INDEX posts_post_author_id ON posts_post (author_id)',
+    'CREATE INDEX posts_post_group_id ON posts_post (group_id)',
+    'CREATE TABLE posts_comment (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'post_id INTEGER NOT NULL, author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, created DATETIME NOT NULL)',
+    'CREATE INDEX posts_comment_post_id ON posts_comment (post_id)',
+    'CREATE TABLE posts_follow (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'user_id INTEGER NOT NULL, author_id INTEGER NOT NULL)',
+    'CREATE UNIQUE INDEX user_author ON posts_follow (user_id, author_id)',
+    'CREATE INDEX posts_follow_author_id ON posts_follow (author_id)',
+)
+
+POST_COLUMNS = 'id, text, pub_date, author_id, group_id, image'
+
+
+def feed_index_sql():
+    """DDL составных индексов ровно в том виде, как их создаёт миграция."""
+    # Редактор не открывается как контекст: SQL только собирается,
+    # поэтому переключать PRAGMA foreign_keys не нужно.
+    editor = connection.SchemaEditorClass(connection, collect_sql=True)
+    for model in (Post, Comment, Follow):
+        for index in model._meta.indexes:
+            editor.add_index(model, index)
+    return editor.collected_sql
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы и время запросов лент на большой SQLite-базе '
+        'до и после составных индексов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--follows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--database',
+                            help='Путь к файлу базы (по умолчанию временный)')
+        parser.add_argument('--json', help='Куда записать результаты')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        path = options['database']
+        if path is None:
+            handle, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+            os.unlink(path)
+        db = sqlite3.connect(path)
+        try:
+            started = time.perf_counter()
+            self.seed(db, options)
+            self.stdout.write(
+                f'Данные подготовлены за {time.perf_counter() - started:.1f} с'
+            )
+            queries = self.queries(db, options)
+            before = self.measure(db, queries, options['repeat'])
+            for statement in feed_index_sql():
+                db.execute(statement.rstrip(';'))
+            db.execute('ANALYZE')
+            after = self.measure(db, queries, options['repeat'])
+        finally:
+            db.close()
+            if options['database'] is None:
+                os.unlink(path)
+        self.report(before, after)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump({'options': options, 'before': before,
+                           'after': after}, output, indent=2, default=str)
+
+    def seed(self, db, options):
+        rnd = self.random
+        for statement in BASE_SCHEMA:
+            db.execute(statement)
+        start = datetime(2020, 1, 1)
+        authors, groups = options['authors'], options['groups']
+
+        def posts():
+            moment = start
+            for _ in range(options['posts']):
+                # Несколько постов в одну секунду дают одинаковые pub_date
+                moment += timedelta(seconds=rnd.randint(0, 2))
+                yield (
+                    'Текст поста ' * 8,
+                    moment.isoformat(' '),
+                    rnd.randint(1, authors),
+                    rnd.randint(1, groups) if rnd.random() < 0.7 else None,
+                )
+
+        db.executemany(
+            'INSERT INTO posts_post (text, pub_date, author_id, group_id) '
+            'VALUES (?, ?, ?, ?)', posts(),
+        )
+        db.executemany(
+            'INSERT INTO posts_comment (post_id, author_id, text, created) '
+            'VALUES (?, ?, ?, ?)',
+            ((rnd.randint(1, options['posts']), rnd.randint(1, authors),
+              'Комментарий', start.isoformat(' '))
+             for _ in range(options['comments'])),
+        )
+        db.executemany(
+            'INSERT OR IGNORE INTO posts_follow (user_id, author_id) '
+            'VALUES (?, ?)',
+            ((rnd.randint(1, authors), rnd.randint(1, authors))
+             for _ in range(options['follows'])),
+        )
+        db.commit()
+        db.execute('ANALYZE')
+
+    def queries(self, db, options):
+        depth = int(options['posts'] * 0.9)
+        pub_date, post_id = db.execute(
+            'SELECT pub_date, id FROM posts_post '
+            'ORDER BY pub_date DESC, id DESC LIMIT 1 OFFSET ?', (depth,),
+        ).fetchone()
+        author = self.random.randint(1, options['authors'])
+        group = self.random.randint(1, options['groups'])
+        return {
+            'index_offset_deep': (
+                f'SELECT {POST_COLUMNS} FROM posts_post '
+                'ORDER BY pub_date DESC, id DESC LIMIT 10 OFFSET ?',
+                (depth,),
+            ),
+            'index_keyset_deep': (
+                f'SELECT {POST_COLUMNS} FROM posts_post '
+                'WHERE pub_date <= ? AND NOT (pub_date = ? AND id >= ?) '
+                'ORDER BY pub_date DESC, id DESC LIMIT 10',
+                (pub_date, pub_date, post_id),
+            ),
+            'author_feed': (
+                f'SELECT {POST_COLUMNS} FROM posts_post WHERE author_id = ? '
+                'ORDER BY pub_date DESC LIMIT 10',
+                (author,),
+            ),
+            'group_feed': (
+                f'SELECT {POST_COLUMNS} FROM posts_post WHERE group_id = ? '
+                'ORDER BY pub_date DESC LIMIT 10',
+                (group,),
+            ),
+            'follow_feed': (
+                'SELECT p.id, p.text, p.pub_date FROM posts_post p '
+                'INNER JOIN posts_follow f ON f.author_id = p.author_id '
+                'WHERE f.user_id = ? ORDER BY p.pub_date DESC LIMIT 10',
+                (author,),
+            ),
+            'post_comments': (
+                'SELECT id, author_id, text, created FROM posts_comment '
+                'WHERE post_id = ? ORDER BY created',
+                (post_id,),
+            ),
+            'author_followers': (
+                'SELECT user_id FROM posts_follow WHERE author_id = ?',
+                (author,),
+            ),
+        }
+
+    def measure(self, db, queries, repeat):
+        results = {}
+        for name, (sql, params) in queries.items():
+            plan = [row[-1] for row in
+                    db.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                db.execute(sql, params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'plan': plan,
+                'median_ms': round(statistics.median(timings), 3),
+                'max_ms': round(max(timings), 3),
+            }
+        return results
+
+    def report(self, before, after):
+        self.stdout.write(
+            f'{"запрос":<20}{"до, мс":>12}{"после, мс":>12}{"ускорение":>12}'
+        )
+        for name in before:
+            old = before[name]['median_ms']
+            new = after[name]['median_ms']
+            speedup = old / new if new else float('inf')
+            self.stdout.write(
+                f'{name:<20}{old:>12.3f}{new:>12.3f}{speedup:>11.1f}x'
+            )
+        for name in before:
+            self.stdout.write(f'\n{name}')
+            self.stdout.write(f'  до:    {"; ".join(before[name]["plan"])}')
+            self.stdout.write(f'  после: {"; ".join(after[name]["plan"])}')
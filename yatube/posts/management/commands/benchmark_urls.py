@@ -0,0 +1,210 @@
+import json
+import math
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+# Адреса, которые меняют данные: повтор исказил бы остальные замеры
+WRITES = {'profile_follow', 'profile_unfollow', 'post_delete', 'add_comment'}
+QUERIES = {
+    'search': {'q': 'кот город'},
+}
+
+
+def percentile(ordered, share):
+    """Значение ранга share% в отсортированном списке (nearest-rank)."""
+    return ordered[max(math.ceil(share / 100 * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все адреса posts.urls через тестовый клиент и '
+        'записывает p50/p95/p99 времени ответа, пропускную способность '
+        'и число SQL-запросов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', nargs='+', metavar='NAME',
+                            help='Имена адресов, например index post_detail')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Без входа: анонимам отдаётся кеш страниц')
+        parser.add_argument('--clear-cache', action='store_true',
+                            help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--as-user',
+                            help='Кем войти; по умолчанию - пользователь '
+                                 'с наибольшим числом подписок')
+        parser.add_argument('--username', help='Автор для адресов профиля')
+        parser.add_argument('--slug', help='Группа для адресов группы')
+        parser.add_argument('--post-id', type=int)
+        parser.add_argument('--json', help='Куда записать результаты')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError('--repeat должен быть не меньше 2')
+        if not Post.objects.exists():
+            raise CommandError('Нет постов: сначала seed_benchmark_data')
+        params = self.params(options)
+        client = Client()
+        if not options['anonymous']:
+            client.force_login(self.reader(options))
+        results = {}
+        for name, url, data in self.urls(params, options['only']):
+            results[name] = self.measure(client, url, data, options)
+        self.report(results)
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self.compare(json.load(previous)['results'], results)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump({
+                    'started_at': timezone.now().isoformat(),
+                    'options': options,
+                    'dataset': self.dataset(),
+                    'database': {
+                        'profile': settings.DATABASE_PROFILE,
+                        'vendor': connection.vendor,
+                    },
+                    'params': params,
+                    'results': results,
+                }, output, indent=2, ensure_ascii=False, default=str)
+
+    def params(self, options):
+        """Самые тяжёлые автор, группа и пост, если не заданы явно."""
+        newest = Post.objects.select_related('author').first()
+        username = options['username'] or (
+            UserStats.objects.filter(posts_count__isnull=False)
+            .order_by('-posts_count')
+            .values_list('user__username', flat=True).first()
+            or newest.author.username
+        )
+        slug = options['slug'] or (
+            Group.objects.filter(posts_count__isnull=False)
+            .order_by('-posts_count').values_list('slug', flat=True).first()
+            or Group.objects.values_list('slug', flat=True).first()
+        )
+        post_id = options['post_id'] or (
+            Comment.objects.values('post').annotate(total=Count('pk'))
+            .order_by('-total').values_list('post', flat=True).first()
+            or newest.pk
+        )
+        return {
+            'username': username,
+            'slug': slug,
+            'post_id': post_id,
+            'format': 'rss',
+        }
+
+    def urls(self, params, only=None):
+        """Имя, адрес и GET-параметры каждого читающего адреса posts."""
+        for pattern in posts_urls.urlpatterns:
+            name = getattr(pattern, 'name', None)
+            if name is None or name in WRITES:
+                continue
+            if only and name not in only:
+                continue
+            url = reverse(f'posts:{name}', kwargs={
+                key: params[key] for key in pattern.pattern.converters
+            })
+            yield name, url, QUERIES.get(name, {})
+
+    def reader(self, options):
+        if options['as_user']:
+            return User.objects.get(username=options['as_user'])
+        busiest = (
+            Follow.objects.values('user').annotate(total=Count('pk'))
+            .order_by('-total').values_list('user', flat=True).first()
+        )
+        if busiest is None:
+            return Post.objects.select_related('author').first().author
+        return User.objects.get(pk=busiest)
+
+    def measure(self, client, url, data, options):
+        for _ in range(options['warmup']):
+            self.fetch(client, url, data)
+        timings, queries = [], []
+        total = time.perf_counter()
+        for _ in range(options['repeat']):
+            if options['clear_cache']:
+                cache.clear()
+            # Запросы ко всем базам: ленты читаются с реплик
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(database))
+                    for database in connections.all()
+                ]
+                started = time.perf_counter()
+                status = self.fetch(client, url, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(sum(len(context) for context in captured))
+        total = time.perf_counter() - total
+        ordered = sorted(timings)
+        return {
+            'url': url,
+            'status': status,
+            'p50_ms': round(percentile(ordered, 50), 3),
+            'p95_ms': round(percentile(ordered, 95), 3),
+            'p99_ms': round(percentile(ordered, 99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'max_ms': round(max(timings), 3),
+            # Запросов в секунду подряд, вместе с открытием соединений
+            'rps': round(options['repeat'] / total, 1),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+        }
+
+    def fetch(self, client, url, data):
+        response = client.get(url, data)
+        if response.streaming:
+            # Потоковый ответ считается целиком, как его прочтёт клиент
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def dataset(self):
+        return {
+            model.__name__.lower(): model.objects.count()
+            for model in (User, Group, Post, Comment, Follow)
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"адрес":<22}{"код":>5}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"p99, мс":>10}{"в сек.":>9}{"запросов":>10}'
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f'{name:<22}{row["status"]:>5}{row["p50_ms"]:>10.2f}'
+                f'{row["p95_ms"]:>10.2f}{row["p99_ms"]:>10.2f}'
+                f'{row["rps"]:>9.1f}{row["queries_max"]:>10}'
+            )
+
+    def compare(self, previous, results):
+        self.stdout.write(
+            f'\n{"адрес":<22}{"p95 было":>10}{"p95 стало":>11}'
+            f'{"в сек. было":>13}{"стало":>7}{"запросов":>12}'
+        )
+        for name, row in results.items():
+            old = previous.get(name)
+            if old is None:
+                continue
+            self.stdout.write(
+                f'{name:<22}{old["p95_ms"]:>10.2f}{row["p95_ms"]:>11.2f}'
+                f'{old.get("rps", 0):>13.1f}{row["rps"]:>7.1f}'
+                f'{old["queries_max"]:>6} → {row["queries_max"]:<4}'
+            )
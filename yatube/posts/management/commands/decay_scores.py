@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = (
+        'Угасание очков рейтинга популярных постов за время с прошлого '
+        'запуска; запускается по расписанию. С --rebuild пересчитывает '
+        'очки с нуля по постам и комментариям'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать очки вместо угасания')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            scored = ranking.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Очки пересчитаны, постов в рейтинге: {scored}'
+            ))
+            return
+        pruned = ranking.decay()
+        self.stdout.write(f'Очки угасли, выпало из рейтинга: {pruned}')
@@ -0,0 +1,79 @@
+import csv
+import json
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+# Поле файла: путь для values_list(); формат тот же, что у import_posts
+FIELDS = {
+    'text': 'text',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'pub_date': 'pub_date',
+    'image': 'image',
+}
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в JSONL или CSV потоком, не держа их в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdout')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='По умолчанию - по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--author', help='Только посты автора')
+        parser.add_argument('--group', help='Только посты группы')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        posts = Post.objects.order_by('pk')
+        if options['author']:
+            posts = posts.filter(author__username=options['author'])
+        if options['group']:
+            posts = posts.filter(group__slug=options['group'])
+        rows = posts.values_list(*FIELDS.values()).iterator(
+            chunk_size=options['chunk_size'],
+        )
+        to_stdout = path == '-'
+        opened = (nullcontext(self.stdout) if to_stdout
+                  else open(path, 'w', newline='', encoding='utf-8'))
+        # При выгрузке в stdout прогресс уходит в stderr
+        log = self.stderr if to_stdout else self.stdout
+        started = time.perf_counter()
+        total = 0
+        with opened as output:
+            write = self.writer(output, format)
+            for row in rows:
+                record = dict(zip(FIELDS, row))
+                record['group'] = record['group'] or ''
+                record['image'] = record['image'] or ''
+                record['pub_date'] = record['pub_date'].isoformat()
+                write(record)
+                total += 1
+                if total % options['chunk_size'] == 0:
+                    self.progress(log, total, started)
+        self.progress(log, total, started)
+
+    def writer(self, output, format):
+        if format == 'csv':
+            writer = csv.DictWriter(output, fieldnames=list(FIELDS),
+                                    lineterminator='\n')
+            writer.writeheader()
+            return writer.writerow
+        return lambda record: output.write(
+            json.dumps(record, ensure_ascii=False) + '\n'
+        )
+
+    def progress(self, log, total, started):
+        elapsed = time.perf_counter() - started
+        log.write(
+            f'{total} постов, {total / elapsed if elapsed else 0:.0f} '
+            f'строк/с'
+        )
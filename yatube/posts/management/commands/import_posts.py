@@ -0,0 +1,163 @@
+import csv
+import json
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import feed, page_cache, search
+from posts.bulk import BATCH_SIZE, batches, create_posts
+from posts.models import Group, Post, User, UserStats
+
+FORMATS = ('jsonl', 'csv')
+
+
+def read_rows(stream, format):
+    """Номер и строка файла; для битой строки JSONL - ошибка разбора."""
+    if format == 'csv':
+        yield from enumerate(csv.DictReader(stream), 1)
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield number, error
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV с полями text, author, group, '
+        'pub_date и image пачками через bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию - по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы, а не '
+                 'пропускать их посты',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        self.create_missing = options['create_missing']
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.touched_authors, self.touched_groups = {}, {}
+        self.skipped = 0
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        opened = (nullcontext(sys.stdin) if path == '-'
+                  else open(path, newline='', encoding='utf-8'))
+        started = time.perf_counter()
+        total = 0
+        try:
+            with opened as stream:
+                posts = filter(None, (
+                    self.build(number, row)
+                    for number, row in read_rows(stream, format)
+                ))
+                for batch in batches(posts, options['batch_size']):
+                    with transaction.atomic():
+                        created = [post.pk for post in create_posts(batch)]
+                        # Только новые посты пачки, без прежних постов
+                        # авторов
+                        feed.fan_out_posts(Post.objects.filter(
+                            pk__gte=min(created), pk__lte=max(created),
+                        ))
+                    total += len(batch)
+                    self.progress(total, started)
+        finally:
+            # Уже записанные пачки доделываются и при ошибке в следующих
+            self.finish(Post.objects.filter(pk__gt=last_pk))
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {total}, пропущено: {self.skipped}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def build(self, number, row):
+        if isinstance(row, json.JSONDecodeError):
+            return self.skip(number, f'некорректный JSON: {row.msg}')
+        if not isinstance(row, dict):
+            return self.skip(number, 'ожидался объект JSON')
+        text = (row.get('text') or '').strip()
+        if not text:
+            return self.skip(number, 'пустой текст')
+        username = row.get('author') or ''
+        author_id = self.resolve(self.authors, username, self.create_author)
+        if author_id is None:
+            return self.skip(number, f'нет автора {username!r}')
+        slug = row.get('group') or ''
+        group_id = None
+        if slug:
+            group_id = self.resolve(self.groups, slug, self.create_group)
+            if group_id is None:
+                return self.skip(number, f'нет группы {slug!r}')
+            self.touched_groups[slug] = group_id
+        self.touched_authors[username] = author_id
+        pub_date = parse_datetime(row.get('pub_date') or '')
+        if pub_date is None:
+            pub_date = timezone.now()
+        elif timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        return Post(text=text, author_id=author_id, group_id=group_id,
+                    pub_date=pub_date, image=row.get('image') or '')
+
+    def resolve(self, lookup, key, create):
+        if key not in lookup and key and self.create_missing:
+            lookup[key] = create(key)
+        return lookup.get(key)
+
+    def create_author(self, username):
+        return User.objects.create_user(username=username).pk
+
+    def create_group(self, slug):
+        return Group.objects.create(title=slug, slug=slug).pk
+
+    def skip(self, number, reason):
+        self.skipped += 1
+        self.stderr.write(f'Строка {number}: {reason}')
+
+    def progress(self, total, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{total} постов, {total / elapsed if elapsed else 0:.0f} '
+            f'строк/с'
+        )
+
+    def finish(self, imported):
+        """
+        Делает то, что bulk_create сделал без сигналов; ленты
+        подписчиков заполняются по пачкам при вставке.
+        """
+        # Счётчики сбрасываются в NULL и пересчитаются при первом чтении
+        author_ids = list(self.touched_authors.values())
+        group_ids = list(self.touched_groups.values())
+        for batch in batches(author_ids, BATCH_SIZE):
+            UserStats.objects.filter(user_id__in=batch).update(
+                posts_count=None,
+            )
+        for batch in batches(group_ids, BATCH_SIZE):
+            Group.objects.filter(pk__in=batch).update(posts_count=None)
+        search.index_posts(imported)
+        for author_id in author_ids:
+            feed.invalidate_author(author_id)
+        page_cache.invalidate(
+            page_cache.FEED_SCOPE,
+            *map(page_cache.group_scope, self.touched_groups),
+            *map(page_cache.profile_scope, self.touched_authors),
+        )
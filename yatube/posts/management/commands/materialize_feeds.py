@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.counters import author_followers_count
+from posts.models import UserStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Возвращает к рассылке по лентам авторов, у которых подписчиков '
+        'стало меньше порога с запасом, и заполняет ленты их подписчиков. '
+        'Авторов сверх порога переводит на чтение на лету'
+    )
+
+    def handle(self, *args, **options):
+        # Порог мог уменьшиться в настройках
+        marked = UserStats.objects.filter(
+            feed_read_time=False, followers_count__gt=feed.fanout_limit(),
+        ).update(feed_read_time=True)
+        authors = UserStats.objects.filter(
+            feed_read_time=True,
+        ).values_list('user_id', flat=True)
+        materialized = 0
+        for author_id in list(authors):
+            if author_followers_count(author_id) <= feed.materialize_limit():
+                feed.materialize(author_id)
+                materialized += 1
+        self.stdout.write(
+            f'На лету: +{marked}, возвращено к рассылке: {materialized}'
+        )
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import background, image_variants, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее готовит миниатюры картинок всех постов и варианты '
+        'для srcset тем постам, у которых их ещё нет'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число потоков; 0 - последовательно в текущем потоке',
+        )
+
+    def handle(self, *args, **options):
+        with_images = (
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by()
+        )
+        names = with_images.values_list('image', flat=True).distinct()
+        started = time.perf_counter()
+        done, failed = background.run_each(
+            thumbnails.generate_feed, names.iterator(), options['workers'],
+            self.report_error,
+        )
+        self.stdout.write(
+            f'Миниатюр: {done}, ошибок: {failed}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
+        posts = with_images.filter(image_variants__isnull=True).only(
+            'pk', 'image',
+        )
+        started = time.perf_counter()
+        done, failed = background.run_each(
+            image_variants.generate_variants, posts.iterator(),
+            options['workers'], self.report_error,
+        )
+        self.stdout.write(
+            f'Постов с вариантами: {done}, ошибок: {failed}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
+
+    def report_error(self, item, error):
+        self.stderr.write(f'{item}: {error}')
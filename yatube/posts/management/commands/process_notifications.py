@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import background, notifications
+from posts.models import NotificationJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Дорабатывает рассылки о новых постах: возвращает в очередь '
+        'брошенные и продолжает каждую с сохранённого курсора'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes', type=int, default=30,
+            help='Через сколько минут без движения рассылка '
+                 'считается брошенной',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Число потоков; 0 - последовательно в текущем потоке',
+        )
+
+    def handle(self, *args, **options):
+        requeued = notifications.requeue_stale(options['stale_minutes'])
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+        jobs = list(NotificationJob.objects.filter(
+            status=NotificationJob.PENDING,
+        ).order_by('pk').values_list('pk', flat=True))
+        started = time.perf_counter()
+        done, failed = background.run_each(
+            notifications.run, jobs, options['workers'], self.report_error,
+        )
+        self.stdout.write(
+            f'Рассылок: {done}, ошибок: {failed}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
+
+    def report_error(self, job_id, error):
+        self.stderr.write(f'Рассылка {job_id}: {error}')
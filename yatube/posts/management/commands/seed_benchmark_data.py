@@ -0,0 +1,191 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts import counters, feed, page_cache, search
+from posts.bulk import batches, create_posts
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+WORDS = (
+    'кот', 'пёс', 'город', 'река', 'новость', 'книга', 'музыка', 'лето',
+    'зима', 'поезд', 'море', 'горы', 'кофе', 'работа', 'выставка',
+    'футбол', 'погода', 'театр', 'рецепт', 'дорога', 'сад', 'фильм',
+    'утро', 'вечер', 'друзья', 'школа', 'парк', 'снег', 'дождь', 'лес',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу большим набором данных для нагрузочных замеров: '
+        'пользователи, группы, посты, комментарии и подписки. Авторы '
+        'и подписки распределены по степенному закону: немногие авторы '
+        'пишут больше всех и собирают большинство подписчиков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--posts', type=int, default=500_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель степенного распределения')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='bench',
+                            help='Префикс имён пользователей и групп')
+        parser.add_argument('--skip-search-index', action='store_true')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+        users = self.create_users(options)
+        groups = self.create_groups(options)
+        # Ранг в случайной перестановке задаёт популярность автора
+        authors = self.random.sample(users, len(users))
+        self.popularity = list(accumulate(
+            1 / rank ** options['skew'] for rank in range(1, len(authors) + 1)
+        ))
+        self.authors = authors
+        seeded_after = self.create_posts(groups, options)
+        self.create_comments(users, seeded_after, options)
+        self.create_follows(users, options)
+        self.stage('Счётчики', counters.rebuild_counters)
+        self.stage('Ленты подписок', lambda: self.fill_feeds(seeded_after))
+        if not options['skip_search_index']:
+            self.stage('Поисковый индекс', lambda: search.index_posts(
+                Post.objects.filter(pk__gt=seeded_after),
+            ))
+        page_cache.invalidate(page_cache.GLOBAL_SCOPE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def pick_author(self):
+        return self.random.choices(self.authors,
+                                   cum_weights=self.popularity)[0]
+
+    def insert(self, label, model, objects, total, create=None, **kwargs):
+        """bulk_create пачками по транзакции с отчётом о скорости."""
+        started = time.perf_counter()
+        done = 0
+        for batch in batches(objects, self.batch_size):
+            with transaction.atomic():
+                if create is None:
+                    model.objects.bulk_create(batch, **kwargs)
+                else:
+                    create(batch)
+            done += len(batch)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label}: {done}/{total}, '
+                f'{done / elapsed if elapsed else 0:.0f} строк/с'
+            )
+
+    def stage(self, label, job):
+        started = time.perf_counter()
+        job()
+        self.stdout.write(
+            f'{label}: {time.perf_counter() - started:.1f} с'
+        )
+
+    def last_pk(self, model):
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def create_users(self, options):
+        start = self.last_pk(User)
+        prefix = options['prefix']
+        # Один на всех непригодный для входа хеш вместо 100k вызовов
+        password = make_password(None)
+        self.insert('Пользователи', User, (
+            User(username=f'{prefix}{start + number}', password=password)
+            for number in range(1, options['users'] + 1)
+        ), options['users'])
+        return list(User.objects.filter(pk__gt=start).values_list(
+            'pk', flat=True,
+        ))
+
+    def create_groups(self, options):
+        start = self.last_pk(Group)
+        prefix = options['prefix']
+        self.insert('Группы', Group, (
+            Group(title=f'Группа {start + number}',
+                  slug=f'{prefix}-{start + number}',
+                  description='Группа для нагрузочных замеров')
+            for number in range(1, options['groups'] + 1)
+        ), options['groups'])
+        return list(Group.objects.filter(pk__gt=start).values_list(
+            'pk', flat=True,
+        ))
+
+    def create_posts(self, groups, options):
+        start = self.last_pk(Post)
+        rnd = self.random
+        count = options['posts']
+        span = timedelta(days=options['days']).total_seconds()
+        moment = timezone.now() - timedelta(seconds=span)
+
+        def posts():
+            nonlocal moment
+            for _ in range(count):
+                # Пуассоновский поток: бывают посты в одну секунду
+                moment += timedelta(seconds=rnd.expovariate(count / span))
+                words = rnd.choices(WORDS, k=rnd.randint(5, 40))
+                yield Post(
+                    text=' '.join(words).capitalize(),
+                    pub_date=moment,
+                    author_id=self.pick_author(),
+                    group_id=(rnd.choice(groups)
+                              if groups and rnd.random() < 0.7 else None),
+                )
+
+        self.insert('Посты', Post, posts(), count, create=create_posts)
+        return start
+
+    def create_comments(self, users, seeded_after, options):
+        last_post = self.last_pk(Post)
+        if last_post <= seeded_after:
+            return
+        rnd = self.random
+        self.insert('Комментарии', Comment, (
+            Comment(post_id=rnd.randint(seeded_after + 1, last_post),
+                    author_id=rnd.choice(users),
+                    text=' '.join(rnd.choices(WORDS, k=rnd.randint(2, 12))))
+            for _ in range(options['comments'])
+        ), options['comments'])
+
+    def create_follows(self, users, options):
+        rnd = self.random
+        mean = options['follows']
+
+        def follows():
+            if not mean:
+                return
+            for user_id in users:
+                wanted = min(int(rnd.expovariate(1 / mean)) + 1,
+                             len(self.authors) - 1)
+                authors = {self.pick_author() for _ in range(wanted)}
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert('Подписки', Follow, follows(), len(users) * mean,
+                    ignore_conflicts=True)
+
+    def fill_feeds(self, seeded_after):
+        """Раскладывает новые посты в ленты подписчиков одним запросом."""
+        UserStats.objects.filter(
+            followers_count__gt=feed.fanout_limit(),
+        ).update(feed_read_time=True)
+        feed.fan_out_posts(Post.objects.filter(pk__gt=seeded_after))
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:06
+
+import math
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия токенизатора posts.search на момент миграции: изменения
+# в приложении не должны менять смысл уже написанной миграции
+WORD_RE = re.compile(r'\w+')
+MIN_LENGTH = 2
+MAX_TERM_LENGTH = 64
+
+
+def term_weights(text):
+    words = [
+        word.replace('ё', 'е')[:MAX_TERM_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+        if len(word) >= MIN_LENGTH
+    ]
+    return {
+        term: round(100 * (1 + math.log(count)))
+        for term, count in Counter(words).items()
+    }
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    posts = Post.objects.values_list('pk', 'text')
+    for post_id, text in posts.iterator():
+        SearchPosting.objects.bulk_create(
+            [SearchPosting(term=term, post_id=post_id, weight=weight)
+             for term, weight in term_weights(text).items()],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='слово')),
+                ('weight', models.PositiveIntegerField(verbose_name='вес')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='posts.Post')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='search_term_post'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_notification_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='following_count',
+            field=models.PositiveIntegerField(null=True, verbose_name='число подписок'),
+        ),
+    ]
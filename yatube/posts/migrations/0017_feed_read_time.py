@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def mark_read_time_authors(apps, schema_editor):
+    # До этой миграции авторов на лету определяло число подписчиков
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    limit = getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 1000)
+    authors = Follow.objects.values('author').annotate(
+        total=Count('pk'),
+    ).filter(total__gt=limit).values_list('author', flat=True)
+    for author_id in authors.iterator():
+        UserStats.objects.update_or_create(
+            user_id=author_id, defaults={'feed_read_time': True},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_read_time',
+            field=models.BooleanField(default=False, verbose_name='лента на лету'),
+        ),
+        migrations.RunPython(mark_read_time_authors,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_read_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingDecay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('decayed_at', models.DateTimeField(verbose_name='последнее угасание')),
+            ],
+            options={
+                'verbose_name': 'Угасание рейтинга',
+                'verbose_name_plural': 'Угасание рейтинга',
+            },
+        ),
+    ]
@@ -1,8 +1,23 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# Поля, которые читают шаблоны лент
+FEED_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'image',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__slug',
+    'group__title',
+)
+
 
 class Group(models.Model):
     objects = None
@@ -10,13 +25,39 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'число постов', null=True, editable=False,
+    )
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Общий queryset для всех лент: автор и группа одним JOIN,
+        только нужные шаблонам колонки и число комментариев.
+        Число берётся из счётчика comments_count, а подзапрос
+        выполняется лишь для ещё не посчитанных постов.
+        """
+        comments = Comment.objects.filter(
+            post=OuterRef('pk'),
+        ).order_by().values('post').annotate(total=Count('pk'))
+        return self.select_related('author', 'group').only(
+            *FEED_FIELDS,
+        ).annotate(
+            comment_count=Coalesce(
+                F('comments_count'),
+                Subquery(comments.values('total')),
+                0,
+                output_field=models.IntegerField(),
+            )
+        )
+
+
 class Post(models.Model):
-    objects = None
+    objects = PostQuerySet.as_manager()
     text = models.TextField()
     pub_date = models.DateTimeField('date published', auto_now_add=True)
     author = models.ForeignKey(
@@ -37,6 +78,9 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    comments_count = models.PositiveIntegerField(
+        'число комментариев', null=True, editable=False,
+    )
 
     def __str__(self):
         return self.text
@@ -45,6 +89,14 @@ class Post(models.Model):
         ordering = ("-pub_date",)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -59,6 +111,12 @@ class Comment(models.Model):
     def __str__(self):
         return self.text
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     objects = None
@@ -74,3 +132,169 @@ class Follow(models.Model):
                 name='user_author'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """
+    Денормализованные счётчики пользователя.
+    NULL в поле означает, что счётчик ещё не посчитан.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+    posts_count = models.PositiveIntegerField('число постов', null=True)
+    followers_count = models.PositiveIntegerField(
+        'число подписчиков', null=True,
+    )
+    following_count = models.PositiveIntegerField(
+        'число подписок', null=True,
+    )
+    # Посты автора читаются в ленту подписок на лету, а не рассылаются
+    feed_read_time = models.BooleanField(
+        'лента на лету', default=False,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class FeedEntry(models.Model):
+    """
+    Строка материализованной ленты подписок: пост автора,
+    разосланный в ленту подписчика при публикации.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="feed_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="feed_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ("-pub_date",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='feed_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+
+
+class PostImageVariant(models.Model):
+    """
+    Уменьшенная копия картинки поста для srcset: одна ширина
+    в одном формате, файл лежит рядом с исходной картинкой.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="image_variants")
+    width = models.PositiveIntegerField('ширина')
+    format = models.CharField('формат', max_length=10)
+    image = models.ImageField('файл', max_length=255)
+    size = models.PositiveIntegerField('размер, байт')
+
+    class Meta:
+        ordering = ("post", "format", "width")
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'width', 'format'],
+                name='image_variant_post_width_format'
+            )
+        ]
+
+
+class SearchPosting(models.Model):
+    """
+    Запись инвертированного индекса: слово встречается в посте,
+    weight - вклад слова в релевантность поста.
+    """
+    term = models.CharField('слово', max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="search_postings")
+    weight = models.PositiveIntegerField('вес')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='search_term_post'
+            )
+        ]
+
+
+class PostScore(models.Model):
+    """
+    Очки поста в рейтинге популярных: растут с каждым комментарием
+    и угасают со временем, см. posts.ranking.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE,
+                                primary_key=True, related_name="ranking")
+    score = models.FloatField('очки')
+
+    class Meta:
+        verbose_name = 'Очки поста'
+        verbose_name_plural = 'Рейтинг постов'
+        indexes = [
+            models.Index(fields=['-score'], name='post_score_idx'),
+        ]
+
+
+class RankingDecay(models.Model):
+    """Единственная строка: когда очки рейтинга угасали в последний раз."""
+    decayed_at = models.DateTimeField('последнее угасание')
+
+    class Meta:
+        verbose_name = 'Угасание рейтинга'
+        verbose_name_plural = 'Угасание рейтинга'
+
+
+class NotificationJob(models.Model):
+    """
+    Рассылка уведомлений о новом посте подписчикам автора.
+    follow_cursor - id последней обработанной подписки: прерванная
+    рассылка продолжается с него.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'готово'),
+        (FAILED, 'ошибка'),
+    )
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="notification_jobs")
+    link = models.URLField('ссылка на пост', max_length=500)
+    status = models.CharField('статус', max_length=10, choices=STATUSES,
+                              default=PENDING)
+    follow_cursor = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField('отправлено писем', default=0)
+    attempts = models.PositiveSmallIntegerField('попыток', default=0)
+    error = models.TextField('последняя ошибка', blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Рассылка о посте'
+        verbose_name_plural = 'Рассылки о постах'
+        indexes = [
+            models.Index(fields=['status', 'updated'],
+                         name='notification_status_idx'),
+        ]
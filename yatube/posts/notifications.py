@@ -0,0 +1,130 @@
+"""
+Письма подписчикам о новых постах.
+
+Запрос только ставит задачу: post_create добавляет строку
+NotificationJob в своей транзакции, а после коммита её номер уходит в
+пул потоков. Рабочий поток проходит подписки автора пачками по
+NOTIFICATION_BATCH_SIZE в порядке id, отправляет каждую пачку одним
+send_messages через одно открытое соединение EMAIL_BACKEND и
+сохраняет follow_cursor после каждой пачки. Задачи, не доведённые до
+конца из-за падения процесса или ошибки почты, дорабатывает команда
+process_notifications, начиная с сохранённого курсора; пачка,
+отправленная перед самым падением, может прийти повторно.
+"""
+import logging
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from . import background
+from .counters import author_followers_count
+from .models import Follow, NotificationJob
+
+logger = logging.getLogger(__name__)
+
+EXCERPT_WORDS = 30
+
+# NOTIFICATION_WORKERS потоков; при 0 рассылка идёт сразу после
+# коммита, а ошибка почты остаётся в задаче, а не в ответе
+pool = background.Pool('notifications', 'NOTIFICATION_WORKERS', logger,
+                       'Рассылка %s не удалась')
+
+
+def batch_size():
+    return getattr(settings, 'NOTIFICATION_BATCH_SIZE', 100)
+
+
+def max_attempts():
+    return getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 3)
+
+
+def enqueue(post, link):
+    """Ставит рассылку о новом посте, если у автора есть подписчики."""
+    if not author_followers_count(post.author_id):
+        return None
+    job = NotificationJob.objects.create(post=post, link=link)
+    transaction.on_commit(partial(submit, job.pk))
+    return job
+
+
+def submit(job_id):
+    pool.submit(job_id, run, job_id)
+
+
+def _update(job_id, **fields):
+    NotificationJob.objects.filter(pk=job_id).update(
+        updated=timezone.now(), **fields,
+    )
+
+
+def claim(job_id):
+    """Забирает задачу из очереди; False, если её уже взял другой поток."""
+    return bool(
+        NotificationJob.objects.filter(
+            pk=job_id, status=NotificationJob.PENDING,
+        ).update(
+            status=NotificationJob.RUNNING,
+            attempts=F('attempts') + 1,
+            updated=timezone.now(),
+        )
+    )
+
+
+def message(job, email):
+    post = job.post
+    author = post.author.get_full_name() or post.author.username
+    return mail.EmailMessage(
+        subject=f'Новый пост: {author}',
+        body=(f'{Truncator(post.text).words(EXCERPT_WORDS)}\n\n'
+              f'Читать полностью: {job.link}'),
+        to=[email],
+    )
+
+
+def run(job_id):
+    """Выполняет задачу с сохранённого курсора до конца подписок."""
+    if not claim(job_id):
+        return
+    job = NotificationJob.objects.select_related('post__author').get(
+        pk=job_id,
+    )
+    followers = Follow.objects.filter(
+        author_id=job.post.author_id,
+    ).exclude(user__email='').order_by('pk').values_list(
+        'pk', 'user__email',
+    )
+    try:
+        # Одно соединение с почтовым сервером на всю рассылку
+        with mail.get_connection() as connection:
+            while True:
+                batch = list(
+                    followers.filter(pk__gt=job.follow_cursor)[:batch_size()]
+                )
+                if not batch:
+                    break
+                messages = [message(job, email) for _, email in batch]
+                job.sent += connection.send_messages(messages) or 0
+                job.follow_cursor = batch[-1][0]
+                _update(job.pk, follow_cursor=job.follow_cursor,
+                        sent=job.sent)
+    except Exception as error:
+        retry = job.attempts < max_attempts()
+        _update(job.pk, error=str(error),
+                status=(NotificationJob.PENDING if retry
+                        else NotificationJob.FAILED))
+        raise
+    _update(job.pk, status=NotificationJob.DONE, error='')
+
+
+def requeue_stale(minutes):
+    """Возвращает в очередь задачи, брошенные упавшим процессом."""
+    return NotificationJob.objects.filter(
+        status=NotificationJob.RUNNING,
+        updated__lt=timezone.now() - timedelta(minutes=minutes),
+    ).update(status=NotificationJob.PENDING, updated=timezone.now())
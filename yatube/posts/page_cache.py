@@ -0,0 +1,163 @@
+"""
+Кеш целых страниц для анонимных посетителей.
+
+Запись в кеше хранит отрисованную страницу вместе с версиями «областей»
+(scope), от которых она зависит: вся лента, группа, профиль, пост.
+Сигналы при изменении данных заменяют версию области на новый токен,
+и все зависящие от неё страницы перестают совпадать по версиям.
+Проверка попадания - два обращения к кешу и ни одного к базе.
+"""
+import hashlib
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+GLOBAL_SCOPE = 'all'
+FEED_SCOPE = 'feed'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(post, group_slug=None):
+    """Области, которые затрагивает изменение поста или его комментариев."""
+    scopes = [
+        FEED_SCOPE,
+        profile_scope(post.author.username),
+        post_scope(post.pk),
+    ]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group.slug))
+    if group_slug is not None:
+        scopes.append(group_scope(group_slug))
+    return scopes
+
+
+def _version_key(scope):
+    return f'page_cache:version:{scope}'
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page_cache:page:{path}'
+
+
+def invalidate(*scopes):
+    """Выдаёт областям новые версии, сбрасывая зависящие страницы."""
+    cache.set_many(
+        {_version_key(scope): uuid4().hex for scope in scopes},
+        timeout=None,
+    )
+
+
+def current_versions(scopes):
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _is_fresh(entry):
+    keys = {_version_key(scope): version
+            for scope, version in entry['versions'].items()}
+    return cache.get_many(keys) == keys
+
+
+def add_page_scopes(request, *scopes):
+    """Добавляет странице зависимости, известные только после запросов."""
+    request.page_cache_scopes = (
+        getattr(request, 'page_cache_scopes', ()) + scopes
+    )
+
+
+def is_anonymous(request):
+    # Без сессионной куки пользователь заведомо аноним, и обращения
+    # к таблице сессий не будет.
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def _not_modified(request, etag):
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return etag in etags or '*' in etags
+
+
+def _respond(request, content, etag, content_type):
+    if _not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def cache_page_for_anonymous(*scopes, timeout=None):
+    """
+    Кеширует ответ view для анонимов. Аргументы - функции, получающие
+    kwargs из URL и возвращающие имя области, либо готовые имена.
+    timeout - функция, возвращающая время жизни страницы, если оно
+    короче PAGE_CACHE_TIMEOUT.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not is_anonymous(request):
+                return view(request, *args, **kwargs)
+            key = _page_key(request)
+            entry = cache.get(key)
+            if entry is not None and _is_fresh(entry):
+                return _respond(request, entry['content'], entry['etag'],
+                                entry['content_type'])
+            names = [GLOBAL_SCOPE] + [
+                scope(**kwargs) if callable(scope) else scope
+                for scope in scopes
+            ]
+            # Версии читаются до запросов view, чтобы изменение во время
+            # отрисовки не закрепило в кеше устаревшую страницу.
+            versions = current_versions(names)
+            # Версии доступны шаблону, чтобы фрагментные кеши страницы
+            # сбрасывались вместе с ней.
+            request.page_cache_versions = dict(versions)
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.cookies:
+                return response
+            extra = getattr(request, 'page_cache_scopes', ())
+            if extra:
+                versions.update(current_versions(extra))
+            content = response.content
+            etag = '"{}"'.format(hashlib.md5(content).hexdigest())
+            cache.set(key, {
+                'content': content,
+                'etag': etag,
+                'content_type': response['Content-Type'],
+                'versions': versions,
+            }, timeout() if timeout else getattr(
+                settings, 'PAGE_CACHE_TIMEOUT', 300,
+            ))
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Cookie',))
+            if _not_modified(request, etag):
+                return _respond(request, content, etag,
+                                response['Content-Type'])
+            return response
+        return wrapper
+    return decorator
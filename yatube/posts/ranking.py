@@ -0,0 +1,158 @@
+"""
+Рейтинг популярных постов.
+
+Очки поста хранятся в таблице PostScore с индексом по score. Новый пост
+получает POST_WEIGHT, каждый комментарий прибавляет COMMENT_WEIGHT одной
+командой UPDATE score = score + w, без пересчёта при чтении. Команда
+decay_scores, запускаемая по расписанию, умножает все очки на
+0.5 ** (прошло / POPULAR_HALF_LIFE_HOURS), где «прошло» - время с
+прошлого угасания из RankingDecay, так что опоздавший, пропущенный или
+повторный запуск не искажает очки. Вклад старых комментариев угасает,
+а посты, чьи очки упали ниже MIN_SCORE, выпадают из таблицы.
+
+Лента /popular/ читает верхние POPULAR_SIZE id из кеша, посты
+страницы - одним запросом по первичному ключу. Страница для анонимов
+кешируется не дольше самого списка.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import page_cache
+from .models import Comment, Post, PostScore, RankingDecay
+
+POPULAR_SCOPE = 'popular'
+POST_WEIGHT = 2.0
+COMMENT_WEIGHT = 1.0
+# Ниже этого пост уже не попадёт в верх рейтинга
+MIN_SCORE = 0.05
+TOP_KEY = 'ranking:top'
+
+
+def half_life():
+    return getattr(settings, 'POPULAR_HALF_LIFE_HOURS', 6) * 3600
+
+
+def cache_timeout():
+    return getattr(settings, 'POPULAR_CACHE_TIMEOUT', 60)
+
+
+def add(post_id, weight):
+    updated = PostScore.objects.filter(post_id=post_id).update(
+        score=F('score') + weight,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            PostScore.objects.create(post_id=post_id, score=weight)
+    except IntegrityError:
+        # Строку только что создал параллельный запрос
+        PostScore.objects.filter(post_id=post_id).update(
+            score=F('score') + weight,
+        )
+
+
+def post_published(post_id):
+    add(post_id, POST_WEIGHT)
+
+
+def comment_added(post_id):
+    add(post_id, COMMENT_WEIGHT)
+
+
+def top_ids():
+    """id самых популярных постов, от первого места."""
+    ids = cache.get(TOP_KEY)
+    if ids is None:
+        ids = list(PostScore.objects.order_by('-score', '-post_id')
+                   .values_list('post_id', flat=True)
+                   [:getattr(settings, 'POPULAR_SIZE', 100)])
+        cache.set(TOP_KEY, ids, cache_timeout())
+    return ids
+
+
+class RankedPosts:
+    """Посты страницы рейтинга в порядке ids, одним запросом."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __iter__(self):
+        posts = Post.objects.for_feed().in_bulk(self.ids)
+        # Удалённый после расчёта рейтинга пост пропускается
+        return (posts[pk] for pk in self.ids if pk in posts)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def invalidate():
+    cache.delete(TOP_KEY)
+    page_cache.invalidate(POPULAR_SCOPE)
+
+
+def _mark_decayed(now):
+    RankingDecay.objects.update_or_create(pk=1, defaults={'decayed_at': now})
+
+
+def decay(now=None):
+    """
+    Угасание за время с прошлого запуска. Возвращает число постов,
+    выпавших из рейтинга; первый запуск только запоминает время.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        last = RankingDecay.objects.select_for_update().filter(
+            pk=1,
+        ).values_list('decayed_at', flat=True).first()
+        _mark_decayed(now)
+        if last is None or last >= now:
+            return 0
+        factor = 0.5 ** ((now - last).total_seconds() / half_life())
+        PostScore.objects.update(score=F('score') * factor)
+        pruned, _ = PostScore.objects.filter(score__lt=MIN_SCORE).delete()
+    invalidate()
+    return pruned
+
+
+def _weight(weight, moment, now):
+    return weight * 0.5 ** ((now - moment).total_seconds() / half_life())
+
+
+def rebuild(now=None):
+    """
+    Пересчитывает очки с нуля по постам и комментариям за время,
+    пока их вклад не меньше MIN_SCORE. Нужен после развёртывания и
+    для исправления дрейфа: удаление комментария очки не уменьшает.
+    """
+    now = now or timezone.now()
+    # Через столько периодов полураспада даже пост угасает до MIN_SCORE
+    since = now - timedelta(
+        seconds=half_life() * math.log2(POST_WEIGHT / MIN_SCORE),
+    )
+    scores = {}
+    posts = Post.objects.filter(pub_date__gte=since).values_list(
+        'pk', 'pub_date',
+    )
+    for post_id, pub_date in posts.iterator():
+        scores[post_id] = _weight(POST_WEIGHT, pub_date, now)
+    comments = Comment.objects.filter(created__gte=since).values_list(
+        'post_id', 'created',
+    )
+    for post_id, created in comments.iterator():
+        scores[post_id] = (scores.get(post_id, 0)
+                           + _weight(COMMENT_WEIGHT, created, now))
+    rows = [PostScore(post_id=post_id, score=score)
+            for post_id, score in scores.items() if score >= MIN_SCORE]
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        PostScore.objects.bulk_create(rows)
+        _mark_decayed(now)
+    invalidate()
+    return len(rows)
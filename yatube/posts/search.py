@@ -0,0 +1,136 @@
+"""
+Полнотекстовый поиск по постам на инвертированном индексе в базе.
+
+Текст поста разбивается на слова, и для каждого слова поста в
+SearchPosting хранится вес 100 * (1 + ln tf). Запрос находит посты, где
+есть все его слова, и ранжирует их по сумме weight * idf в целых числах,
+чтобы курсор по (score, id) сравнивался точно. Индекс не зависит от
+СУБД, обновляется сигналом при сохранении поста и удаляется вместе
+с постом каскадом.
+"""
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, F, IntegerField, Max, Sum, Value, When,
+)
+
+from .models import Post, SearchPosting
+
+WORD_RE = re.compile(r'\w+')
+MIN_LENGTH = 2
+MAX_TERM_LENGTH = SearchPosting._meta.get_field('term').max_length
+MAX_QUERY_TERMS = 8
+BATCH_SIZE = 1000
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре, «ё» заменена на «е»."""
+    return [
+        word.replace('ё', 'е')[:MAX_TERM_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+        if len(word) >= MIN_LENGTH
+    ]
+
+
+def term_weights(text):
+    return {
+        term: round(100 * (1 + math.log(count)))
+        for term, count in Counter(tokenize(text)).items()
+    }
+
+
+def postings(post):
+    return [
+        SearchPosting(term=term, post_id=post.pk, weight=weight)
+        for term, weight in term_weights(post.text).items()
+    ]
+
+
+@transaction.atomic
+def index_post(post):
+    SearchPosting.objects.filter(post_id=post.pk).delete()
+    SearchPosting.objects.bulk_create(postings(post))
+
+
+@transaction.atomic
+def rebuild_index():
+    """Переиндексирует все посты и возвращает их число."""
+    SearchPosting.objects.all().delete()
+    return _index(Post.objects.all())
+
+
+@transaction.atomic
+def index_posts(posts):
+    """Переиндексирует посты из queryset и возвращает их число."""
+    SearchPosting.objects.filter(post__in=posts).delete()
+    return _index(posts)
+
+
+def _index(posts):
+    batch, count = [], 0
+    for post in posts.only('pk', 'text').order_by().iterator():
+        batch.extend(postings(post))
+        count += 1
+        if len(batch) >= BATCH_SIZE:
+            SearchPosting.objects.bulk_create(batch)
+            batch = []
+    SearchPosting.objects.bulk_create(batch)
+    return count
+
+
+def query_terms(query):
+    return sorted(set(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def _idf(terms):
+    """Целые idf слов запроса; None, если какого-то слова нет в индексе."""
+    frequencies = dict(
+        SearchPosting.objects.filter(term__in=terms)
+        .values_list('term').annotate(Count('pk')).order_by()
+    )
+    if len(frequencies) < len(terms):
+        return None
+    # Наибольший id вместо COUNT(*): для idf важен масштаб, а он
+    # читается по первичному ключу без прохода по таблице.
+    total = Post.objects.aggregate(total=Max('pk'))['total'] or 1
+    return {
+        term: 1 + round(100 * math.log(max(total, count) / count))
+        for term, count in frequencies.items()
+    }
+
+
+def matching(query):
+    """Подзапрос id постов, в которых есть все слова запроса."""
+    terms = query_terms(query)
+    return (
+        SearchPosting.objects.filter(term__in=terms)
+        .values('post_id').annotate(matched=Count('pk'))
+        .filter(matched=len(terms)).values('post_id')
+    )
+
+
+def search_posts(query, group=None):
+    """Посты ленты с аннотацией score, где есть все слова запроса."""
+    terms = query_terms(query)
+    idf = _idf(terms) if terms else None
+    if not idf:
+        # score нужен и пустому результату: по нему идёт сортировка
+        return Post.objects.none().annotate(
+            score=Value(0, output_field=IntegerField()),
+        )
+    score = Sum(
+        Case(*[
+            When(search_postings__term=term,
+                 then=F('search_postings__weight') * weight)
+            for term, weight in idf.items()
+        ], output_field=IntegerField())
+    )
+    posts = Post.objects.for_feed().filter(search_postings__term__in=terms)
+    if group is not None:
+        posts = posts.filter(group=group)
+    return posts.annotate(
+        score=score, matched=Count('search_postings'),
+    ).filter(matched=len(terms))
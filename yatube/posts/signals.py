@@ -0,0 +1,111 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feed, follow_graph, page_cache, ranking, search
+from .models import Comment, Follow, Group, Post, PostImageVariant
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, **kwargs):
+    """Запоминает прежнюю группу, чтобы заметить перенос поста."""
+    if instance.pk is not None:
+        instance._old_group_id, instance._old_group_slug = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'group__slug',
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    page_cache.invalidate(*page_cache.post_scopes(
+        instance, getattr(instance, '_old_group_slug', None),
+    ))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    try:
+        scopes = page_cache.post_scopes(instance.post)
+    except Post.DoesNotExist:
+        scopes = [page_cache.post_scope(instance.post_id)]
+    page_cache.invalidate(*scopes)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    # Название и адрес группы выводятся во всех лентах
+    page_cache.invalidate(page_cache.GLOBAL_SCOPE)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        counters.add_author_posts(instance.author_id, 1)
+        counters.add_group_posts(instance.group_id, 1)
+        feed.fan_out_post(instance)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        counters.add_group_posts(old_group_id, -1)
+        counters.add_group_posts(instance.group_id, 1)
+    instance._old_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.add_author_posts(instance.author_id, -1)
+    counters.add_group_posts(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.add_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.add_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def rank_new_post(sender, instance, created, **kwargs):
+    if created:
+        ranking.post_published(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def rank_commented_post(sender, instance, created, **kwargs):
+    if created:
+        ranking.comment_added(instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_follow_feeds(sender, instance, **kwargs):
+    feed.invalidate_author(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.follow_created(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follow_graph.follow_deleted(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=PostImageVariant)
+def delete_variant_file(sender, instance, **kwargs):
+    instance.image.delete(save=False)
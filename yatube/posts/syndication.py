@@ -0,0 +1,242 @@
+"""
+Ленты для агрегаторов: RSS, Atom и JSON Feed.
+
+Ленты есть у главной страницы, у каждой группы и у каждого автора.
+ETag собирается из даты самого нового поста и версии области
+page_cache, которую сбрасывают сигналы при правке и удалении постов,
+а Last-Modified - из даты самого нового поста. Повторный опрос без
+изменений получает 304 после одного запроса по индексу (-pub_date).
+Документ отдаётся потоком по мере чтения постов и складывается в кеш
+под текущим ETag, поэтому до следующего поста он отдаётся из кеша.
+"""
+import hashlib
+import json
+from calendar import timegm
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .models import Group, Post, User
+from .page_cache import (
+    FEED_SCOPE, current_versions, group_scope, profile_scope,
+)
+
+FEED_LENGTH = 20
+TITLE_WORDS = 8
+
+
+class StreamingFeedMixin:
+    """Пишет ленту feedgenerator по частям, по одной на пост."""
+
+    def __init__(self, *args, updated=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updated = updated
+
+    def latest_post_date(self):
+        # Посты читаются потоком, поэтому дата известна заранее
+        return self.updated or super().latest_post_date()
+
+    def item(self, **kwargs):
+        self.add_item(**kwargs)
+        return self.items.pop()
+
+    def stream(self, items):
+        output = StringIO()
+        handler = SimplerXMLGenerator(output, 'utf-8')
+
+        def drain():
+            chunk = output.getvalue()
+            output.seek(0)
+            output.truncate()
+            return chunk
+
+        handler.startDocument()
+        self.start_document(handler)
+        self.add_root_elements(handler)
+        yield drain()
+        for item in items:
+            handler.startElement(self.item_element,
+                                 self.item_attributes(item))
+            self.add_item_elements(handler, item)
+            handler.endElement(self.item_element)
+            yield drain()
+        self.end_document(handler)
+        yield drain()
+
+
+class StreamingRssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    item_element = 'item'
+
+    def start_document(self, handler):
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+
+    def end_document(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+
+
+class StreamingAtomFeed(StreamingFeedMixin, Atom1Feed):
+    item_element = 'entry'
+
+    def start_document(self, handler):
+        handler.startElement('feed', self.root_attributes())
+
+    def end_document(self, handler):
+        handler.endElement('feed')
+
+
+class StreamingJsonFeed(StreamingFeedMixin, Rss201rev2Feed):
+    """JSON Feed 1.1; от RssFeed берутся только add_item и метаданные."""
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def stream(self, items):
+        head = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.feed['title'],
+            'home_page_url': self.feed['link'],
+            'feed_url': self.feed['feed_url'],
+            'description': self.feed['description'],
+        }, ensure_ascii=False)
+        yield head[:-1] + ', "items": ['
+        separator = ''
+        for item in items:
+            yield separator + json.dumps({
+                'id': item['unique_id'],
+                'url': item['link'],
+                'title': item['title'],
+                'content_text': item['description'],
+                'date_published': item['pubdate'].isoformat(),
+                'authors': [{'name': item['author_name']}],
+                'tags': item['categories'],
+            }, ensure_ascii=False)
+            separator = ', '
+        yield ']}'
+
+
+FORMATS = {
+    'rss': StreamingRssFeed,
+    'atom': StreamingAtomFeed,
+    'json': StreamingJsonFeed,
+}
+
+
+class FeedSource:
+    def __init__(self, title, description, link, scope, posts):
+        self.title = title
+        self.description = description
+        self.link = link
+        self.scope = scope
+        self.posts = posts
+
+
+def index_source():
+    return FeedSource(
+        'Yatube', 'Последние обновления на сайте', reverse('posts:index'),
+        FEED_SCOPE, Post.objects.all(),
+    )
+
+
+def group_source(slug):
+    group = get_object_or_404(Group, slug=slug)
+    return FeedSource(
+        group.title, group.description,
+        reverse('posts:group_list', args=(slug,)),
+        group_scope(slug), group.posts.all(),
+    )
+
+
+def profile_source(username):
+    author = get_object_or_404(User, username=username)
+    return FeedSource(
+        author.get_full_name() or username, f'Записи {username}',
+        reverse('posts:profile', args=(username,)),
+        profile_scope(username), author.posts.all(),
+    )
+
+
+def _items(request, feed, source):
+    posts = source.posts.select_related('author', 'group').order_by(
+        '-pub_date', '-pk',
+    )[:FEED_LENGTH]
+    for post in posts.iterator():
+        link = request.build_absolute_uri(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        yield feed.item(
+            title=Truncator(post.text).words(TITLE_WORDS),
+            link=link,
+            description=post.text,
+            author_name=post.author.get_full_name() or post.author.username,
+            pubdate=post.pub_date,
+            unique_id=link,
+            categories=[post.group.title] if post.group_id else (),
+        )
+
+
+def _caching(key, etag, chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, (etag, ''.join(parts)),
+              getattr(settings, 'SYNDICATION_CACHE_TIMEOUT', 60 * 60 * 24))
+
+
+def syndication_view(source_for):
+    """View ленты в формате из URL для источника source_for(**kwargs)."""
+    def view(request, format, **kwargs):
+        if format not in FORMATS:
+            raise Http404
+        source = source_for(**kwargs)
+        newest = source.posts.order_by('-pub_date').values_list(
+            'pub_date', flat=True,
+        ).first()
+        version = current_versions([source.scope])[source.scope]
+        etag = quote_etag(hashlib.md5(
+            f'{format}|{version}|{newest}'.encode()
+        ).hexdigest())
+        last_modified = timegm(newest.utctimetuple()) if newest else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+        )
+        if response is None:
+            feed_class = FORMATS[format]
+            key = f'syndication:{format}:{source.scope}'
+            cached = cache.get(key)
+            if cached is not None and cached[0] == etag:
+                response = HttpResponse(cached[1],
+                                        content_type=feed_class.content_type)
+            else:
+                feed = feed_class(
+                    title=source.title,
+                    link=request.build_absolute_uri(source.link),
+                    description=source.description,
+                    feed_url=request.build_absolute_uri(),
+                    language=settings.LANGUAGE_CODE,
+                    updated=newest,
+                )
+                response = StreamingHttpResponse(
+                    _caching(key, etag,
+                             feed.stream(_items(request, feed, source))),
+                    content_type=feed_class.content_type,
+                )
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+    return view
+
+
+index_feed = syndication_view(index_source)
+group_feed = syndication_view(group_source)
+profile_feed = syndication_view(profile_source)
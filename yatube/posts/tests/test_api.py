@@ -0,0 +1,129 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Новости', slug='news', description='Описание',
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, group=self.group,
+                                text=f'Новость {number}')
+            for number in range(13)
+        ]
+        self.post = self.posts[-1]
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(f'posts:{name}', args=args), params)
+
+    def test_post_list_pages_with_cursor(self):
+        with self.assertNumQueries(1):
+            first = self.get('api_post_list').json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(first['results'][0], {
+            'id': self.post.pk,
+            'text': self.post.text,
+            'pub_date': first['results'][0]['pub_date'],
+            'author': 'writer',
+            'group': 'news',
+            'image': '',
+            'comment_count': 0,
+        })
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+        self.assertIsNone(second['next'])
+
+    def test_sparse_fields(self):
+        data = self.get('api_post_list', fields='id,author').json()
+        self.assertEqual(data['results'][0],
+                         {'id': self.post.pk, 'author': 'writer'})
+        self.assertIn('fields=id%2Cauthor', data['next'])
+        response = self.get('api_post_list', fields='id,password')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['error'])
+
+    def test_group_and_profile_lists(self):
+        other = Post.objects.create(author=self.reader, text='Без группы')
+        group_ids = {row['id'] for row in
+                     self.get('api_group_post_list', 'news').json()['results']}
+        self.assertNotIn(other.pk, group_ids)
+        profile = self.get('api_profile_post_list', 'reader').json()
+        self.assertEqual([row['id'] for row in profile['results']],
+                         [other.pk])
+        response = self.get('api_group_post_list', 'missing')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_groups(self):
+        self.assertEqual(self.get('api_group_list').json()['results'], [{
+            'slug': 'news', 'title': 'Новости', 'description': 'Описание',
+            'post_count': 13,
+        }])
+
+    def test_groups_page_with_cursor(self):
+        for number in range(10):
+            Group.objects.create(title=f'Группа {number}',
+                                 slug=f'group-{number}')
+        first = self.get('api_group_list', fields='slug').json()
+        self.assertEqual(first['results'][0], {'slug': 'news'})
+        self.assertEqual(len(first['results']), 10)
+        rest = self.client.get(first['next']).json()
+        self.assertEqual(rest['results'], [{'slug': 'group-9'}])
+        self.assertIsNone(rest['next'])
+
+    def test_post_detail_with_comments(self):
+        for number in range(12):
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text=f'Комментарий {number}')
+        with self.assertNumQueries(2):
+            data = self.get('api_post_detail', self.post.pk).json()
+        self.assertEqual(data['comment_count'], 12)
+        self.assertEqual(len(data['comments']), 10)
+        self.assertEqual(data['comments'][0]['author'], 'reader')
+        rest = self.client.get(data['comments_next']).json()
+        self.assertEqual(len(rest['results']), 2)
+        response = self.get('api_post_detail', 0)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow_requires_login(self):
+        for name in ('api_follow_list', 'api_follow_post_list'):
+            response = self.get(name)
+            self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.get('api_follow_list').json()['results'],
+                         [{'author': 'writer'}])
+        data = self.get('api_follow_post_list').json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+    def test_follow_list_pages_by_username(self):
+        names = sorted(f'author{number:02}' for number in range(12))
+        for name in reversed(names):
+            Follow.objects.create(
+                user=self.reader,
+                author=User.objects.create_user(username=name),
+            )
+        self.client.force_login(self.reader)
+        first = self.get('api_follow_list').json()
+        self.assertEqual([row['author'] for row in first['results']],
+                         names[:10])
+        rest = self.client.get(first['next']).json()
+        self.assertEqual([row['author'] for row in rest['results']],
+                         names[10:])
+        self.assertIsNone(rest['next'])
+
+    def test_only_get(self):
+        response = self.client.post(reverse('posts:api_post_list'))
+        self.assertEqual(response.status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
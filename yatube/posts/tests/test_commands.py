@@ -0,0 +1,186 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from ..bulk import create_posts
+from ..counters import author_posts_count, group_posts_count
+from ..models import FeedEntry, Follow, Group, Post, User
+from ..search import search_posts
+
+
+class BenchmarkIndexesCommandTest(SimpleTestCase):
+    def test_reports_every_query_before_and_after(self):
+        out = StringIO()
+        call_command(
+            'benchmark_indexes', posts=500, authors=20, groups=5,
+            comments=100, follows=50, repeat=1, stdout=out,
+        )
+        report = out.getvalue()
+        for name in ('index_keyset_deep', 'group_feed', 'post_comments'):
+            self.assertIn(name, report)
+        self.assertIn('post_pub_date_id_idx', report)
+
+
+class ImportExportCommandsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Новости', slug='news', description='Описание',
+        )
+        # Счётчики уже посчитаны и должны учесть импорт
+        author_posts_count(self.author)
+        group_posts_count(self.group)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write_jsonl(self, name, rows):
+        with open(self.path(name), 'w', encoding='utf-8') as output:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return self.path(name)
+
+    def test_import_in_batches(self):
+        rows = [{'text': f'Пост про жирафа {number}', 'author': 'writer',
+                 'group': 'news', 'pub_date': f'2020-01-{number + 1:02}'
+                 'T10:00:00+00:00'} for number in range(5)]
+        rows += [{'text': 'Без автора', 'author': 'nobody'},
+                 {'text': '', 'author': 'writer'}]
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', self.write_jsonl('posts.jsonl', rows),
+                     batch_size=2, stdout=out, stderr=err)
+        self.assertIn('Импортировано постов: 5, пропущено: 2',
+                      out.getvalue())
+        self.assertIn('строк/с', out.getvalue())
+        self.assertIn("нет автора 'nobody'", err.getvalue())
+        post = Post.objects.earliest('pub_date')
+        self.assertEqual(post.pub_date.isoformat(),
+                         '2020-01-01T10:00:00+00:00')
+        self.author.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(author_posts_count(self.author), 5)
+        self.assertEqual(group_posts_count(self.group), 5)
+        self.assertEqual(search_posts('жирафа').count(), 5)
+        self.assertEqual(self.reader.feed_entries.count(), 5)
+
+    def test_create_posts_keeps_dates_and_sets_ids(self):
+        dates = [datetime(2020, 1, day, tzinfo=timezone.utc)
+                 for day in (3, 1, 2)]
+        created = create_posts([
+            Post(author=self.author, text=str(number), pub_date=pub_date)
+            for number, pub_date in enumerate(dates)
+        ])
+        self.assertEqual(
+            [Post.objects.get(pk=post.pk).text for post in created],
+            ['0', '1', '2'],
+        )
+        self.assertEqual(
+            list(Post.objects.order_by('text').values_list(
+                'pub_date', flat=True,
+            )),
+            dates,
+        )
+
+    def test_import_fans_out_only_new_posts(self):
+        old = Post.objects.create(author=self.author, text='Старый пост')
+        # Подписчик уже не видит старый пост в ленте
+        FeedEntry.objects.filter(post=old).delete()
+        rows = [{'text': 'Новый пост', 'author': 'writer'}]
+        call_command('import_posts', self.write_jsonl('posts.jsonl', rows),
+                     stdout=StringIO())
+        self.assertEqual(
+            list(self.reader.feed_entries.values_list('post__text',
+                                                      flat=True)),
+            ['Новый пост'],
+        )
+
+    def test_malformed_lines_are_skipped(self):
+        path = self.path('posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write('{"text": "Пост", "author": "writer"}\n'
+                         '{"text": оборван\n'
+                         '[1, 2]\n')
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, stdout=out, stderr=err)
+        self.assertIn('Импортировано постов: 1, пропущено: 2',
+                      out.getvalue())
+        self.assertIn('Строка 2: некорректный JSON', err.getvalue())
+
+    def test_create_missing(self):
+        rows = [{'text': 'Текст', 'author': 'newcomer', 'group': 'fresh'}]
+        call_command('import_posts', self.write_jsonl('posts.jsonl', rows),
+                     create_missing=True, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertEqual(post.group.slug, 'fresh')
+
+    def test_export_and_import_round_trip(self):
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Первый, "с кавычками"')
+        Post.objects.create(author=self.author, text='Второй\nв две строки')
+        for format in ('csv', 'jsonl'):
+            with self.subTest(format=format):
+                path = self.path(f'posts.{format}')
+                call_command('export_posts', path, chunk_size=1,
+                             stdout=StringIO())
+                exported = list(Post.objects.order_by('pk').values_list(
+                    'text', 'group', 'pub_date',
+                ))
+                Post.objects.all().delete()
+                call_command('import_posts', path, stdout=StringIO())
+                self.assertEqual(
+                    list(Post.objects.order_by('pk').values_list(
+                        'text', 'group', 'pub_date',
+                    )),
+                    exported,
+                )
+
+    def test_export_to_stdout(self):
+        Post.objects.create(author=self.author, text='Пост')
+        out = StringIO()
+        call_command('export_posts', '-', author='writer', stdout=out,
+                     stderr=StringIO())
+        self.assertEqual(json.loads(out.getvalue()), {
+            'text': 'Пост', 'author': 'writer', 'group': '',
+            'pub_date': Post.objects.get().pub_date.isoformat(),
+            'image': '',
+        })
+
+
+class BenchmarkDataTest(TestCase):
+    def test_seed_and_benchmark_urls(self):
+        call_command(
+            'seed_benchmark_data', users=30, posts=300, groups=3,
+            comments=60, follows=5, batch_size=100, stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(search_posts('кот').exists())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'run.json')
+        out = StringIO()
+        call_command('benchmark_urls', repeat=3, warmup=0, json=path,
+                     stdout=out)
+        with open(path) as run:
+            results = json.load(run)['results']
+        for name in ('index', 'follow_index', 'post_detail', 'search',
+                     'index_feed', 'api_post_list'):
+            self.assertEqual(results[name]['status'], 200, name)
+            self.assertLessEqual(results[name]['p50_ms'],
+                                 results[name]['p99_ms'])
+        self.assertGreater(results['post_detail']['queries_max'], 0)
+        self.assertNotIn('post_delete', results)
+        call_command('benchmark_urls', repeat=2, warmup=0, only=['index'],
+                     compare=path, stdout=out)
+        self.assertIn('p95 было', out.getvalue())
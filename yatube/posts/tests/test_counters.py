@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..counters import (
+    author_posts_count, group_posts_count, post_comments_count,
+)
+from ..models import Comment, Group, Post, User
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='counter_author')
+        self.group = Group.objects.create(
+            title='Группа',
+            slug='counter_slug',
+            description='Описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_counter_slug',
+            description='Описание',
+        )
+
+    def refresh(self):
+        self.author.refresh_from_db()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+
+    def test_counters_follow_create_move_delete(self):
+        """Счётчики меняются при создании, переносе и удалении поста."""
+        self.assertEqual(author_posts_count(self.author), 0)
+        self.assertEqual(group_posts_count(self.group), 0)
+        self.assertEqual(group_posts_count(self.other_group), 0)
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост',
+        )
+        self.assertEqual(post_comments_count(post), 0)
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        self.refresh()
+        post.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.refresh()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.refresh()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_uncounted_values_are_computed_lazily(self):
+        """Пропущенные сигналами посты учитываются при первом чтении."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, group=self.group, text='Пост')
+             for _ in range(3)]
+        )
+        post = Post.objects.first()
+        self.assertEqual(author_posts_count(self.author), 3)
+        self.assertEqual(group_posts_count(self.group), 3)
+        self.assertEqual(post_comments_count(post), 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост',
+        )
+        self.assertEqual(author_posts_count(self.author), 1)
+        Post.objects.bulk_create(
+            [Post(author=self.author, group=self.group, text='Пост')
+             for _ in range(2)]
+        )
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.author, text='Ответ')
+             for _ in range(2)]
+        )
+        call_command('rebuild_counters', stdout=StringIO())
+        self.refresh()
+        post.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 3)
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertEqual(post.comments_count, 2)
+
+    def test_profile_paginator_reads_counter(self):
+        Post.objects.create(author=self.author, text='Пост')
+        author_posts_count(self.author)
+        response = Client().get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertEqual(response.context['count'], 1)
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
@@ -0,0 +1,138 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.cache_stats import fragment_stats
+
+from ..models import FeedEntry, Follow, Post, User
+
+
+class FollowFeedTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.feed_texts(), ['Новый пост'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Post.objects.create(author=self.author, text='Старый пост')
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertEqual(self.feed_texts(), ['Старый пост'])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_is_read_at_request_time(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Пост звезды')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), ['Пост звезды'])
+
+    def test_author_dropping_below_limit_is_materialized_by_command(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.settings(FEED_FANOUT_MAX_FOLLOWERS=1):
+            Follow.objects.create(user=other, author=self.author)
+            Post.objects.create(author=self.author, text='Пост')
+            self.assertFalse(FeedEntry.objects.exists())
+            # Отписка не заполняет ленты: автор остаётся на лету
+            Follow.objects.filter(user=other).delete()
+            self.assertFalse(FeedEntry.objects.exists())
+            self.assertEqual(self.feed_texts(), ['Пост'])
+            # Один подписчик - ещё не ниже порога 1 * 0.9
+            call_command('materialize_feeds', stdout=StringIO())
+            self.assertFalse(FeedEntry.objects.exists())
+            with self.settings(FEED_MATERIALIZE_RATIO=1):
+                call_command('materialize_feeds', stdout=StringIO())
+            self.assertEqual(self.feed_texts(), ['Пост'])
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader).exists()
+        )
+
+    def test_page_is_ordered_by_feed_entries(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for text in ('Первый', 'Второй', 'Третий'):
+            Post.objects.create(author=self.author, text=text)
+        self.assertEqual(self.feed_texts(), ['Третий', 'Второй', 'Первый'])
+        cursor = self.client.get(reverse('posts:follow_index'),
+                                 {'cursor': ''})
+        self.assertEqual([post.text for post in cursor.context['page_obj']],
+                         ['Третий', 'Второй', 'Первый'])
+
+
+class FollowFeedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='cache_reader')
+        self.author = User.objects.create_user(username='cache_writer')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Первый пост')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:follow_index')
+
+    def follow_page_stats(self):
+        return fragment_stats().get(
+            'follow_page', {'hits': 0, 'misses': 0},
+        )
+
+    def test_repeat_request_hits_fragment(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Первый пост')
+        self.assertEqual(self.follow_page_stats()['hits'], 1)
+        self.assertEqual(self.follow_page_stats()['misses'], 1)
+
+    def test_fragment_is_per_user(self):
+        self.client.get(self.url)
+        other = Client()
+        other.force_login(User.objects.create_user(username='stranger'))
+        self.assertNotContains(other.get(self.url), 'Первый пост')
+
+    def test_new_post_of_followed_author_invalidates(self):
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.assertContains(self.client.get(self.url), 'Второй пост')
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_new_post_of_read_time_author_invalidates(self):
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.assertContains(self.client.get(self.url), 'Второй пост')
+
+    def test_unfollow_invalidates(self):
+        self.client.get(self.url)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertNotContains(self.client.get(self.url), 'Первый пост')
+
+    def test_stats_are_staff_only(self):
+        url = reverse('core:cache_stats')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+        self.reader.is_staff = True
+        self.reader.save()
+        self.client.get(self.url)
+        response = self.client.get(url)
+        self.assertIn('follow_page', response.json()['fragments'])
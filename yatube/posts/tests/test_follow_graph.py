@@ -0,0 +1,184 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import follow_graph
+from ..models import Follow, User
+
+
+class FollowGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='graph_reader')
+        self.authors = [
+            User.objects.create_user(username=f'graph_author{number}')
+            for number in range(4)
+        ]
+        for author in self.authors[:2]:
+            Follow.objects.create(user=self.reader, author=author)
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_state_checked_by_one_cache_read(self):
+        ids = [author.pk for author in self.authors]
+        follow_graph.following_ids(self.reader.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader, self.authors[0].pk)
+            )
+            self.assertFalse(
+                follow_graph.is_following(AnonymousUser(), ids[0])
+            )
+
+    def test_follow_and_unfollow_write_through(self):
+        follow_graph.following_ids(self.reader.pk)
+        author = self.authors[2]
+        self.client.get(reverse('posts:profile_follow',
+                                args=(author.username,)))
+        with self.assertNumQueries(0):
+            self.assertIn(author.pk,
+                          follow_graph.following_ids(self.reader.pk))
+        self.client.get(reverse('posts:profile_unfollow',
+                                args=(author.username,)))
+        with self.assertNumQueries(0):
+            self.assertNotIn(author.pk,
+                             follow_graph.following_ids(self.reader.pk))
+
+    def test_counts_kept_by_signals(self):
+        author = self.authors[0]
+        self.assertEqual(follow_graph.following_count(self.reader), 2)
+        self.assertEqual(follow_graph.followers_count(author), 1)
+        # Ещё не посчитанные счётчики считаются при первом чтении
+        self.assertEqual(follow_graph.following_count(author), 0)
+        self.assertEqual(follow_graph.followers_count(self.reader), 0)
+        Follow.objects.create(user=author, author=self.reader)
+        Follow.objects.filter(user=self.reader, author=author).delete()
+        self.reader.refresh_from_db()
+        author.refresh_from_db()
+        self.assertEqual(self.reader.stats.following_count, 1)
+        self.assertEqual(self.reader.stats.followers_count, 1)
+        self.assertEqual(author.stats.followers_count, 0)
+        self.assertEqual(author.stats.following_count, 1)
+
+    def test_profile_reads_follow_state_from_cache(self):
+        author = self.authors[0]
+        url = reverse('posts:profile', args=(author.username,))
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertFalse([query for query in captured
+                          if 'posts_follow' in query['sql']])
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['followers_count'], 1)
+        self.assertEqual(response.context['following_count'], 0)
+
+    def test_follow_refreshes_cached_profile_counts(self):
+        author = self.authors[3]
+        url = reverse('posts:profile', args=(author.username,))
+        anonymous = Client()
+        self.assertContains(anonymous.get(url), 'id="followers-count">0<')
+        self.client.get(reverse('posts:profile_follow',
+                                args=(author.username,)))
+        self.assertContains(anonymous.get(url), 'id="followers-count">1<')
+
+
+class FollowEndpointsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='endpoint_reader')
+        self.author = User.objects.create_user(username='endpoint_author')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.follow_url = reverse('posts:profile_follow',
+                                  args=(self.author.username,))
+        self.unfollow_url = reverse('posts:profile_unfollow',
+                                    args=(self.author.username,))
+
+    def ajax(self, url):
+        return self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    @override_settings(
+        USER_CACHE_ENABLED=True,
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    )
+    def test_follow_resolves_author_inside_the_insert(self):
+        # Загружает сессию и пользователя запроса в кеш
+        self.ajax(self.unfollow_url)
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(self.follow_url)
+        statements = [query['sql'] for query in captured
+                      if not query['sql'].startswith(('SAVEPOINT',
+                                                      'RELEASE'))]
+        # Сессия и пользователь запроса берутся из кеша
+        self.assertTrue(statements[0].startswith('INSERT INTO "posts_follow"'),
+                        statements[0])
+        self.assertEqual(
+            [sql for sql in statements if sql.startswith(
+                ('INSERT INTO "posts_follow"', 'DELETE FROM "posts_follow"'),
+            )],
+            statements[:1],
+        )
+
+    def test_double_click_is_idempotent(self):
+        first = self.ajax(self.follow_url)
+        second = self.ajax(self.follow_url)
+        self.assertEqual(first.json(), {'following': True, 'changed': True})
+        self.assertEqual(second.json(), {'following': True, 'changed': False})
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 1,
+        )
+        self.assertEqual(follow_graph.followers_count(self.author), 1)
+
+        first = self.ajax(self.unfollow_url)
+        second = self.ajax(self.unfollow_url)
+        self.assertEqual(first.json(), {'following': False, 'changed': True})
+        self.assertEqual(second.json(),
+                         {'following': False, 'changed': False})
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_self_follow_is_ignored(self):
+        response = self.ajax(reverse('posts:profile_follow',
+                                     args=(self.reader.username,)))
+        self.assertEqual(response.json(),
+                         {'following': False, 'changed': False})
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unknown_author(self):
+        for name in ('profile_follow', 'profile_unfollow'):
+            response = self.client.get(reverse(f'posts:{name}',
+                                               args=('nobody',)))
+            self.assertEqual(response.status_code, 404)
+
+    def test_regular_request_redirects_to_profile(self):
+        response = self.client.get(self.follow_url)
+        self.assertRedirects(
+            response, reverse('posts:profile', args=(self.author.username,)),
+        )
+
+    def test_old_sqlite_changes_follow_without_returning(self):
+        with mock.patch.object(follow_graph.sqlite3, 'sqlite_version_info',
+                               (3, 34, 1)):
+            with CaptureQueriesContext(connection) as captured:
+                first = self.ajax(self.follow_url)
+            second = self.ajax(self.follow_url)
+            self.assertEqual(first.json(),
+                             {'following': True, 'changed': True})
+            self.assertEqual(second.json(),
+                             {'following': True, 'changed': False})
+            self.assertEqual(follow_graph.followers_count(self.author), 1)
+            first = self.ajax(self.unfollow_url)
+            second = self.ajax(self.unfollow_url)
+            self.assertEqual(first.json(),
+                             {'following': False, 'changed': True})
+            self.assertEqual(second.json(),
+                             {'following': False, 'changed': False})
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(any('RETURNING' in query['sql']
+                             for query in captured))
@@ -0,0 +1,141 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import notifications
+from ..models import Follow, NotificationJob, Post, User
+
+LINK = 'http://testserver/posts/1/'
+
+
+@override_settings(NOTIFICATION_WORKERS=0, NOTIFICATION_BATCH_SIZE=2,
+                   NOTIFICATION_MAX_ATTEMPTS=2)
+class NotificationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.followers = [
+            User.objects.create_user(
+                username=f'reader{number}',
+                email=f'reader{number}@example.com',
+            )
+            for number in range(5)
+        ]
+        # Без адреса письмо не отправить, подписка пропускается
+        self.followers.append(User.objects.create_user(username='silent'))
+        Follow.objects.bulk_create(
+            Follow(user=user, author=self.author) for user in self.followers
+        )
+        self.post = Post.objects.create(author=self.author, text='Новый пост')
+
+    def job(self):
+        return NotificationJob.objects.get()
+
+    def test_no_job_without_followers(self):
+        lonely = User.objects.create_user(username='lonely')
+        post = Post.objects.create(author=lonely, text='Никто не прочтёт')
+        self.assertIsNone(notifications.enqueue(post, LINK))
+        self.assertFalse(NotificationJob.objects.exists())
+
+    def test_post_create_enqueues_job(self):
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('posts:post_create'), {'text': 'Свежий пост'})
+        job = self.job()
+        post = Post.objects.get(text='Свежий пост')
+        self.assertEqual(job.post, post)
+        self.assertEqual(job.status, NotificationJob.PENDING)
+        self.assertEqual(
+            job.link,
+            'http://testserver'
+            + reverse('posts:post_detail', args=(post.pk,)),
+        )
+
+    def test_run_sends_to_every_follower_in_batches(self):
+        job = notifications.enqueue(self.post, LINK)
+        with mock.patch.object(EmailBackend, 'send_messages',
+                               autospec=True,
+                               side_effect=EmailBackend.send_messages) as send:
+            notifications.run(job.pk)
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(user.email for user in self.followers if user.email),
+        )
+        self.assertIn(LINK, mail.outbox[0].body)
+        job = self.job()
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual(job.sent, 5)
+        self.assertEqual(job.attempts, 1)
+
+    def test_failed_batch_is_retried_from_cursor(self):
+        job = notifications.enqueue(self.post, LINK)
+        original = EmailBackend.send_messages
+        calls = []
+
+        def flaky(backend, messages):
+            calls.append(len(messages))
+            if len(calls) == 2:
+                raise ConnectionError('почтовый сервер недоступен')
+            return original(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', flaky):
+            with self.assertRaises(ConnectionError):
+                notifications.run(job.pk)
+            job = self.job()
+            self.assertEqual(job.status, NotificationJob.PENDING)
+            self.assertEqual(job.sent, 2)
+            self.assertIn('недоступен', job.error)
+            notifications.run(job.pk)
+        job = self.job()
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual(job.sent, 5)
+        self.assertEqual(job.error, '')
+        # Первая пачка повторно не отправляется
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_job_fails_after_max_attempts(self):
+        job = notifications.enqueue(self.post, LINK)
+        with mock.patch.object(EmailBackend, 'send_messages',
+                               side_effect=ConnectionError('нет связи')):
+            for _ in range(3):
+                try:
+                    notifications.run(job.pk)
+                except ConnectionError:
+                    pass
+        job = self.job()
+        self.assertEqual(job.status, NotificationJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_inline_submit_logs_mail_errors(self):
+        job = notifications.enqueue(self.post, LINK)
+        with mock.patch.object(EmailBackend, 'send_messages',
+                               side_effect=ConnectionError('нет связи')):
+            with self.assertLogs('posts.notifications', 'ERROR'):
+                notifications.submit(job.pk)
+        self.assertEqual(self.job().status, NotificationJob.PENDING)
+
+    def test_command_resumes_stale_job(self):
+        job = notifications.enqueue(self.post, LINK)
+        last = Follow.objects.filter(author=self.author).order_by('pk')[1]
+        # Процесс упал после первой пачки
+        NotificationJob.objects.filter(pk=job.pk).update(
+            status=NotificationJob.RUNNING, follow_cursor=last.pk, sent=2,
+            attempts=1, updated=timezone.now() - timedelta(hours=1),
+        )
+        out = StringIO()
+        call_command('process_notifications', workers=0, stdout=out)
+        self.assertIn('Возвращено в очередь: 1', out.getvalue())
+        self.assertIn('Рассылок: 1, ошибок: 0', out.getvalue())
+        job = self.job()
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual(job.sent, 5)
+        self.assertEqual(len(mail.outbox), 3)
@@ -0,0 +1,82 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+
+class AnonymousPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='cached_author')
+        self.group = Group.objects.create(
+            title='Группа',
+            slug='cached_slug',
+            description='Описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Первый пост',
+        )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def test_repeated_request_skips_database(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.client.get(url)
+                self.assertEqual(len(queries), 0)
+                self.assertEqual(second.content, first.content)
+
+    def test_new_post_invalidates_feeds(self):
+        for url in self.urls[:3]:
+            self.client.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Второй пост',
+        )
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Второй пост')
+
+    def test_comment_invalidates_post_detail(self):
+        url = self.urls[3]
+        self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.author, text='Да')
+        response = self.client.get(url)
+        self.assertEqual(response.context['comments_count'], 1)
+
+    def test_unrelated_group_page_stays_cached(self):
+        other = Group.objects.create(
+            title='Другая', slug='other_cached_slug', description='Описание',
+        )
+        url = reverse('posts:group_list', args=(other.slug,))
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Без группы')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), 0)
+
+    def test_etag_gives_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_authorized_user_is_not_served_from_cache(self):
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.urls[2])
+        response = client.get(self.urls[2])
+        self.assertIsNotNone(response.context)
+        self.assertNotIn('ETag', response)
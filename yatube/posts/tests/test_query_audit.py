@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+@override_settings(QUERY_AUDIT_STRICT=True)
+class ViewsQueryAuditTest(TestCase):
+    """Страницы постов без N+1: повтор запроса роняет тест."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        groups = [
+            Group.objects.create(title=f'Группа {number}',
+                                 slug=f'group-{number}', description='-')
+            for number in range(3)
+        ]
+        authors = [
+            User.objects.create_user(username=f'author{number}',
+                                     first_name=f'Имя {number}')
+            for number in range(4)
+        ]
+        for author in authors:
+            Follow.objects.create(user=self.reader, author=author)
+        self.posts = [
+            Post.objects.create(author=authors[number % 4],
+                                group=groups[number % 3],
+                                text=f'Кот номер {number}')
+            for number in range(12)
+        ]
+        self.post = self.posts[-1]
+        for author in authors:
+            Comment.objects.create(post=self.post, author=author,
+                                   text='Комментарий')
+
+    def urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:popular'),
+            reverse('posts:group_list', args=('group-0',)),
+            reverse('posts:profile', args=('author0',)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            reverse('posts:search') + '?q=кот',
+            reverse('posts:index_feed', args=('rss',)),
+            reverse('posts:api_post_list'),
+            reverse('posts:api_post_detail', args=(self.post.pk,)),
+            reverse('posts:api_group_list'),
+        ]
+
+    def test_anonymous_pages(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                self.client.get(url)
+
+    def test_reader_pages(self):
+        self.client.force_login(self.reader)
+        urls = self.urls() + [
+            reverse('posts:follow_index'),
+            reverse('posts:api_follow_post_list'),
+            reverse('posts:post_create'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.client.get(url)
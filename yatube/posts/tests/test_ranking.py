@@ -0,0 +1,99 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import ranking
+from ..models import Comment, Post, PostScore, RankingDecay, User
+
+
+class RankingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='ranked_author')
+        self.reader = User.objects.create_user(username='ranked_reader')
+        self.quiet = Post.objects.create(author=self.author, text='Тихий')
+        self.discussed = Post.objects.create(author=self.author,
+                                             text='Обсуждаемый')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def comment(self, post):
+        self.client.post(reverse('posts:add_comment', args=(post.pk,)),
+                         {'text': 'Комментарий'})
+
+    def popular_texts(self, client=None):
+        response = (client or self.client).get(reverse('posts:popular'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_comments_raise_post_incrementally(self):
+        self.assertEqual(PostScore.objects.get(post=self.quiet).score,
+                         ranking.POST_WEIGHT)
+        self.comment(self.quiet)
+        self.assertEqual(PostScore.objects.get(post=self.quiet).score,
+                         ranking.POST_WEIGHT + ranking.COMMENT_WEIGHT)
+        self.comment(self.discussed)
+        self.comment(self.discussed)
+        self.assertEqual(self.popular_texts(), ['Обсуждаемый', 'Тихий'])
+
+    def test_top_is_read_from_cache(self):
+        self.popular_texts()
+        self.comment(self.quiet)
+        # Порядок обновится, когда истечёт POPULAR_CACHE_TIMEOUT
+        self.assertEqual(self.popular_texts(), ['Обсуждаемый', 'Тихий'])
+        cache.delete(ranking.TOP_KEY)
+        self.assertEqual(self.popular_texts(), ['Тихий', 'Обсуждаемый'])
+
+    def test_decay_halves_scores_and_drops_faded_posts(self):
+        anonymous = Client()
+        self.assertEqual(self.popular_texts(anonymous),
+                         ['Обсуждаемый', 'Тихий'])
+        self.comment(self.discussed)
+        PostScore.objects.filter(post=self.quiet).update(
+            score=ranking.MIN_SCORE * 1.5,
+        )
+        RankingDecay.objects.create(
+            pk=1,
+            decayed_at=timezone.now() - timedelta(hours=6),
+        )
+        out = StringIO()
+        call_command('decay_scores', stdout=out)
+        self.assertIn('выпало из рейтинга: 1', out.getvalue())
+        self.assertAlmostEqual(
+            PostScore.objects.get(post=self.discussed).score,
+            (ranking.POST_WEIGHT + ranking.COMMENT_WEIGHT) / 2, places=3,
+        )
+        # Повторный запуск сразу после угасает лишь на прошедшие мгновения
+        call_command('decay_scores', stdout=out)
+        self.assertAlmostEqual(
+            PostScore.objects.get(post=self.discussed).score,
+            (ranking.POST_WEIGHT + ranking.COMMENT_WEIGHT) / 2, places=3,
+        )
+        # Угасание сбрасывает закешированную страницу анонима
+        self.assertEqual(self.popular_texts(anonymous), ['Обсуждаемый'])
+
+    def test_first_decay_only_remembers_time(self):
+        call_command('decay_scores', stdout=StringIO())
+        self.assertTrue(RankingDecay.objects.exists())
+        self.assertEqual(PostScore.objects.get(post=self.quiet).score,
+                         ranking.POST_WEIGHT)
+
+    def test_rebuild_weights_by_age(self):
+        old = timezone.now() - timedelta(hours=12)
+        Post.objects.filter(pk=self.discussed.pk).update(pub_date=old)
+        Comment.objects.create(post=self.discussed, author=self.reader,
+                               text='Давно')
+        Comment.objects.filter(post=self.discussed).update(created=old)
+        PostScore.objects.all().delete()
+        call_command('decay_scores', rebuild=True, stdout=StringIO())
+        scores = dict(PostScore.objects.values_list('post', 'score'))
+        self.assertAlmostEqual(scores[self.quiet.pk], ranking.POST_WEIGHT,
+                               places=3)
+        self.assertAlmostEqual(
+            scores[self.discussed.pk],
+            (ranking.POST_WEIGHT + ranking.COMMENT_WEIGHT) / 4, places=3,
+        )
@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, SearchPosting
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='searcher')
+        self.group = Group.objects.create(
+            title='Котики', slug='cats', description='Описание',
+        )
+        self.cats = Post.objects.create(
+            author=self.author, group=self.group,
+            text='Кот и ещё кот, и снова кот на ёлке',
+        )
+        self.dog = Post.objects.create(
+            author=self.author, text='Пёс прогнал кота с ёлки',
+        )
+        self.other = Post.objects.create(
+            author=self.author, text='Совсем про другое: кот',
+        )
+
+    def texts(self, query, group=None):
+        return [post.text for post in search_posts(query, group)
+                .order_by('-score', '-pk')]
+
+    def test_all_words_required_and_ranked(self):
+        self.assertEqual(self.texts('кот'),
+                         [self.cats.text, self.other.text])
+        self.assertEqual(self.texts('Кот ЕЛКЕ'), [self.cats.text])
+        self.assertEqual(self.texts('кот жираф'), [])
+
+    def test_group_filter(self):
+        self.assertEqual(self.texts('кот', self.group), [self.cats.text])
+
+    def test_edit_and_delete_update_index(self):
+        self.other.text = 'Теперь про жирафа'
+        self.other.save()
+        self.assertEqual(self.texts('жирафа'), [self.other.text])
+        self.assertEqual(self.texts('кот'), [self.cats.text])
+        self.other.delete()
+        self.assertEqual(self.texts('жирафа'), [])
+
+    def test_view_pages_with_cursor(self):
+        for number in range(12):
+            Post.objects.create(author=self.author,
+                                text=f'кот номер {number}')
+        url = reverse('posts:search')
+        first = self.client.get(url, {'q': 'кот'})
+        self.assertEqual(len(first.context['page_obj']), 10)
+        cursor = first.context['page_obj'].next_cursor
+        self.assertContains(first, f'q=%D0%BA%D0%BE%D1%82&amp;cursor={cursor}')
+        second = self.client.get(url, {'q': 'кот', 'cursor': cursor})
+        seen = {post.pk for post in first.context['page_obj']}
+        rest = {post.pk for post in second.context['page_obj']}
+        self.assertEqual(len(seen | rest), 14)
+        self.assertFalse(seen & rest)
+
+    def test_view_without_results(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'жираф'})
+        self.assertContains(response, 'Ничего не найдено')
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'ёлке кот'},
+        )
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.cats])
+
+    def test_rebuild_command(self):
+        SearchPosting.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.texts('пес'), [self.dog.text])
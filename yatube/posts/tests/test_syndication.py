@@ -0,0 +1,99 @@
+import json
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class SyndicationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='blogger')
+        self.group = Group.objects.create(
+            title='Новости', slug='news', description='Описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Первая новость',
+        )
+        self.urls = {
+            'index': reverse('posts:index_feed', args=('rss',)),
+            'group': reverse('posts:group_feed', args=('news', 'rss')),
+            'profile': reverse('posts:profile_feed',
+                               args=('blogger', 'rss')),
+        }
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+        else:
+            response.body = response.content
+        return response
+
+    def test_formats(self):
+        rss = self.get(self.urls['index'])
+        self.assertTrue(rss.streaming)
+        titles = [item.findtext('title') for item in
+                  ElementTree.fromstring(rss.body).iter('item')]
+        self.assertEqual(titles, ['Первая новость'])
+        atom = self.get(reverse('posts:group_feed', args=('news', 'atom')))
+        entries = ElementTree.fromstring(atom.body).findall(
+            f'{ATOM}entry'
+        )
+        self.assertEqual(len(entries), 1)
+        data = json.loads(self.get(
+            reverse('posts:profile_feed', args=('blogger', 'json'))
+        ).body)
+        self.assertEqual(data['items'][0]['content_text'], 'Первая новость')
+        self.assertEqual(data['items'][0]['tags'], ['Новости'])
+
+    def test_unknown_feed_is_404(self):
+        for url in (reverse('posts:index_feed', args=('xml',)),
+                    reverse('posts:group_feed', args=('nope', 'rss'))):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
+
+    def test_conditional_get(self):
+        for name, url in self.urls.items():
+            with self.subTest(feed=name):
+                response = self.get(url)
+                etag = response['ETag']
+                self.assertEqual(
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    .status_code, HTTPStatus.NOT_MODIFIED,
+                )
+                self.assertEqual(
+                    self.client.get(
+                        url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                    ).status_code, HTTPStatus.NOT_MODIFIED,
+                )
+
+    def test_new_post_changes_etag(self):
+        etags = {name: self.get(url)['ETag']
+                 for name, url in self.urls.items()}
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Вторая новость')
+        for name, url in self.urls.items():
+            with self.subTest(feed=name):
+                response = self.get(url, HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('Вторая новость', response.body.decode())
+
+    def test_unchanged_feed_is_served_from_cache(self):
+        url = self.urls['index']
+        first = self.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get(url)
+        self.assertFalse(second.streaming)
+        self.assertEqual(second.body, first.body)
+        self.assertEqual(len(queries), 1)
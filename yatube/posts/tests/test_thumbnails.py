@@ -0,0 +1,172 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .. import image_variants, thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='big.png'):
+    content = BytesIO()
+    Image.new('RGB', (1200, 800), 'teal').save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+class PoolTest(SimpleTestCase):
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_jobs_run_in_pool_threads_and_drain_waits(self):
+        release = threading.Event()
+        done = []
+
+        def job(name):
+            release.wait(5)
+            done.append((name, threading.current_thread().name))
+
+        thumbnails.pool.submit('first', job, 'first')
+        # Пока первая задача не выполнена, повтор не ставится
+        thumbnails.pool.submit('first', job, 'first')
+        thumbnails.pool.submit('second', job, 'second')
+        self.assertEqual(done, [])
+        release.set()
+        thumbnails.pool.drain()
+        self.assertEqual(sorted(name for name, _ in done),
+                         ['first', 'second'])
+        for _, thread in done:
+            self.assertTrue(thread.startswith('thumbnails'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='painter')
+        self.post = Post.objects.create(
+            author=self.author, text='С картинкой', image=make_image(),
+        )
+
+    def lookup(self):
+        return default.backend.lookup(
+            ImageFile(self.post.image),
+            thumbnails.FEED_GEOMETRY, thumbnails.FEED_OPTIONS,
+        )
+
+    def test_template_does_not_generate_thumbnail(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(self.lookup())
+
+    def test_pregenerated_thumbnail_is_rendered(self):
+        thumbnail = thumbnails.generate_feed(self.post.image.name)
+        self.assertEqual(thumbnail.size, [960, 339])
+        self.assertEqual(self.lookup().name, thumbnail.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_command_pregenerates_existing_images(self):
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Миниатюр: 1, ошибок: 0', out.getvalue())
+        self.assertIsNotNone(self.lookup())
+
+    def test_page_thumbnails_resolved_in_one_batch(self):
+        posts = [self.post] + [
+            Post.objects.create(author=self.author, text=str(number),
+                                image=make_image(f'{number}.png'))
+            for number in range(3)
+        ]
+        for post in posts[:2]:
+            thumbnails.generate_feed(post.image.name)
+        cache.clear()
+
+        def kvstore_queries():
+            with CaptureQueriesContext(connection) as queries:
+                thumbnails.attach_thumbnails(posts)
+            return [query for query in queries
+                    if 'thumbnail_kvstore' in query['sql']]
+
+        self.assertEqual(len(kvstore_queries()), 1)
+        self.assertEqual(kvstore_queries(), [])
+        ready = [post.thumbnail_url != post.image.url for post in posts]
+        self.assertEqual(ready, [True, True, False, False])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageVariantsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='photographer')
+        self.post = Post.objects.create(
+            author=self.author, text='С вариантами', image=make_image(),
+        )
+
+    def test_variants_for_every_width_and_format(self):
+        variants = image_variants.generate_variants(self.post)
+        self.assertEqual(
+            {(variant.format, variant.width) for variant in variants},
+            {(format, width)
+             for format in image_variants.variant_formats()
+             for width in image_variants.VARIANT_WIDTHS},
+        )
+        for variant in variants:
+            with self.subTest(width=variant.width, format=variant.format):
+                self.assertTrue(variant.image.name.startswith('posts/big_'))
+                with Image.open(variant.image.path) as image:
+                    self.assertEqual(image.width, variant.width)
+
+    def test_feed_renders_srcset(self):
+        image_variants.generate_variants(self.post)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, ' 320w')
+
+    def test_post_delete_removes_variant_files(self):
+        paths = [variant.image.path for variant in
+                 image_variants.generate_variants(self.post)]
+        self.post.delete()
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_clearing_image_removes_variants(self):
+        paths = [variant.image.path for variant in
+                 image_variants.generate_variants(self.post)]
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': self.post.text, 'image-clear': 'on'},
+        )
+        self.assertFalse(self.post.image_variants.exists())
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_benchmark_reports_savings(self):
+        out = StringIO()
+        call_command('benchmark_image_bytes', viewports=[360], dpr=[1],
+                     stdout=out)
+        report = out.getvalue()
+        self.assertIn('Постов с картинками на странице: 1', report)
+        self.assertTrue(self.post.image_variants.exists())
@@ -8,10 +8,13 @@ from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from mixer.backend.django import mixer
 
 from . import common_constants
-from ..models import Group, Post, Follow
+from ..counters import rebuild_counters
+from ..models import Comment, Group, Post, Follow
 
 
 User = get_user_model()
@@ -218,6 +221,141 @@ class PaginatorViewsTest(TestCase):
             )
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cursor_author')
+        cls.group = Group.objects.create(
+            title='Группа для курсоров',
+            slug='cursor_slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create(
+            [
+                Post(
+                    text=f'Курсорный пост {i}',
+                    author=cls.author,
+                    group=cls.group
+                ) for i in range(13)
+            ]
+        )
+        # Одинаковая дата у всех постов: порядок держится только на id.
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_pages_walk_whole_feed(self):
+        """Курсоры проходят ленту вперёд и назад без пропусков."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.authorized_client.get(url + '?cursor=')
+                first_page = first.context['page_obj']
+                self.assertTrue(first_page.is_cursor)
+                self.assertFalse(first_page.has_previous())
+                second = self.authorized_client.get(
+                    url + '?cursor=' + first_page.next_cursor
+                )
+                second_page = second.context['page_obj']
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    [post.pk for post in first_page]
+                    + [post.pk for post in second_page],
+                    expected,
+                )
+                back = self.authorized_client.get(
+                    url + '?cursor=' + second_page.previous_cursor
+                )
+                self.assertEqual(
+                    [post.pk for post in back.context['page_obj']],
+                    expected[:10],
+                )
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=xx')
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class FeedQueryBudgetTest(TestCase):
+    """Ленты не делают запросов на каждую строку страницы."""
+    QUERY_BUDGET = 6
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='budget_reader')
+        cls.group = Group.objects.create(
+            title='Группа ленты',
+            slug='budget_slug',
+            description='Тестовое описание'
+        )
+        for i in range(12):
+            author = User.objects.create_user(
+                username=f'budget_author_{i}',
+                first_name='Автор',
+                last_name=str(i),
+            )
+            group = Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'budget_slug_{i}',
+                description='Тестовое описание'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                author=author,
+                group=group if i % 2 else cls.group,
+                text=f'Пост {i}',
+            )
+        cls.author = author
+        for i in range(12):
+            Post.objects.create(
+                author=author,
+                group=cls.group if i % 2 else None,
+                text=f'Ещё пост {i}',
+            )
+        rebuild_counters()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feed_pages_stay_within_query_budget(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?cursor=',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertEqual(len(response.context['page_obj']), 10)
+                self.assertLessEqual(
+                    len(queries), self.QUERY_BUDGET,
+                    '\n'.join(query['sql'] for query in queries),
+                )
+
+
 class FollowViewsTest(TestCase):
     def setUp(self):
         self.client_auth_follower = Client()
@@ -301,7 +439,7 @@ class CacheTests(TestCase):
         content = self.authorized_client.get(
             common_constants.INDEX_URL[0]
         ).content
-        post.delete
+        post.delete()
         content_after_delete = self.authorized_client.get(
             common_constants.INDEX_URL[0]
         ).content
@@ -311,3 +449,55 @@ class CacheTests(TestCase):
             common_constants.INDEX_URL[0],
         ).content
         self.assertNotEqual(content, content_after_cacheclear)
+
+
+class CommentsPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='commenter')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.comments = [
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text=f'Комментарий {number}')
+            for number in range(25)
+        ]
+        self.detail_url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.new_url = reverse('posts:post_comments', args=(self.post.pk,))
+
+    def ids(self, comments):
+        return [comment.pk for comment in comments]
+
+    def test_detail_pages_comments_oldest_first(self):
+        first = self.client.get(self.detail_url).context['comments']
+        self.assertEqual(self.ids(first), self.ids(self.comments[:20]))
+        second = self.client.get(
+            self.detail_url, {'cursor': first.next_cursor},
+        ).context['comments']
+        self.assertEqual(self.ids(second), self.ids(self.comments[20:]))
+        self.assertFalse(second.has_next())
+
+    def test_fragment_returns_only_newer_comments(self):
+        response = self.client.get(
+            self.new_url, {'after': self.comments[22].pk},
+        )
+        self.assertEqual(self.ids(response.context['comments']),
+                         self.ids(self.comments[23:]))
+        self.assertNotContains(response, '<html')
+        latest = self.client.get(self.new_url,
+                                 {'after': self.comments[-1].pk})
+        self.assertEqual(latest.status_code, 204)
+        missing = self.client.get(self.new_url, {'after': 'x'})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_ajax_comment_returns_fragment(self):
+        url = reverse('posts:add_comment', args=(self.post.pk,))
+        response = self.client.post(url, {'text': 'Новый'},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 201)
+        comment = Comment.objects.latest('pk')
+        self.assertContains(response, f'data-comment-id="{comment.pk}"',
+                            status_code=201)
+        invalid = self.client.post(url, {'text': ''})
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(invalid.context['post'], self.post)
@@ -0,0 +1,223 @@
+"""
+Фоновая подготовка миниатюр картинок постов.
+
+Тег {% thumbnail %} в шаблонах больше не обрабатывает изображение во
+время запроса: если миниатюры ещё нет в хранилище ключей sorl, отдаётся
+исходная картинка, а генерация уходит в пул потоков. Картинки новых и
+отредактированных постов ставятся в очередь сразу после сохранения
+формы, уже загруженные - командой pregenerate_thumbnails. Запрос
+своих задач не ждёт; pool.drain дожидается всех поставленных задач.
+
+Шаблоны лент получают готовый post.thumbnail_url: prepare_page находит
+миниатюры всех постов страницы одним get_many к кешу и, для промахов,
+одним запросом к таблице хранилища ключей.
+"""
+import logging
+from functools import partial
+
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import background, feed, image_variants, page_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Миниатюра, которую показывают ленты и страница поста
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+pool = background.Pool('thumbnails', 'THUMBNAIL_WORKERS', logger,
+                       'Не удалось подготовить миниатюру %s')
+
+
+def generate(name, geometry_string, **options):
+    """Создаёт миниатюру, если её ещё нет. Вызывается вне запроса."""
+    return default.backend.generate(name, geometry_string, **options)
+
+
+def schedule(name, geometry_string, options):
+    key = (name, geometry_string, tuple(sorted(options.items())))
+    transaction.on_commit(
+        partial(pool.submit, key, generate, name, geometry_string, **options)
+    )
+
+
+def generate_feed(name):
+    return generate(name, FEED_GEOMETRY, **FEED_OPTIONS)
+
+
+def _prepare_post(post_id, name):
+    generate_feed(name)
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id,
+    ).first()
+    if post is not None:
+        image_variants.generate_variants(post)
+        # Страницы, отрисованные до готовности миниатюры, закешированы
+        # с исходной картинкой.
+        page_cache.invalidate(*page_cache.post_scopes(post))
+        feed.invalidate_author(post.author_id)
+
+
+def schedule_post(post):
+    """
+    Ставит в очередь миниатюру и варианты картинки сохранённого поста.
+    Если картинку убрали, сразу удаляет её прежние варианты.
+    """
+    if not post.image:
+        image_variants.delete_variants(post)
+        return
+    name = post.image.name
+    transaction.on_commit(
+        partial(pool.submit, ('post', post.pk, name), _prepare_post,
+                post.pk, name)
+    )
+
+
+class NonBlockingBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl, который не создаёт миниатюры во время отрисовки:
+    отсутствующая миниатюра заменяется исходной картинкой.
+    """
+
+    def _normalize(self, source, options):
+        # Те же умолчания, что подставляет ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, source, geometry_string, options):
+        """Файл миниатюры, под которым её сохранит get_thumbnail."""
+        options = self._normalize(source, dict(options))
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup(self, source, geometry_string, options):
+        """Готовая миниатюра из хранилища ключей или None."""
+        return default.kvstore.get(
+            self.thumbnail_file(source, geometry_string, options)
+        )
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        thumbnail = self.lookup(source, geometry_string, options)
+        if thumbnail is not None:
+            return thumbnail
+        schedule(source.name, geometry_string, options)
+        return source
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+class CachedKVStore(cached_db_kvstore.KVStore):
+    """Хранилище ключей sorl с пакетным чтением нескольких миниатюр."""
+
+    def get_many(self, image_files):
+        """
+        Возвращает {ключ файла: ImageFile или None} за одно обращение к
+        кешу и не больше одного запроса к базе.
+        """
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            rows = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            # Отсутствующие тоже кешируются, как в _get_raw
+            found = {key: rows.get(key, cached_db_kvstore.EMPTY_VALUE)
+                     for key in missing}
+            self.cache.set_many(
+                found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+            values.update(found)
+        return {
+            keys[key]: (None if value == cached_db_kvstore.EMPTY_VALUE
+                        else deserialize_image_file(value))
+            for key, value in values.items()
+        }
+
+
+def attach_thumbnails(posts, geometry_string=FEED_GEOMETRY,
+                      options=FEED_OPTIONS):
+    """
+    Проставляет постам thumbnail_url. Несгенерированные миниатюры
+    заменяются исходной картинкой и ставятся в очередь.
+    """
+    backend = default.backend
+    wanted = []
+    for post in posts:
+        post.thumbnail_url = None
+        if post.image:
+            source = ImageFile(post.image)
+            wanted.append((post, source, backend.thumbnail_file(
+                source, geometry_string, options,
+            )))
+    if not wanted:
+        return posts
+    found = default.kvstore.get_many(
+        [thumbnail for _, _, thumbnail in wanted]
+    )
+    for post, source, thumbnail in wanted:
+        ready = found.get(thumbnail.key)
+        if ready is None:
+            schedule(source.name, geometry_string, options)
+            post.thumbnail_url = source.url
+        else:
+            post.thumbnail_url = ready.url
+    return posts
+
+
+def attach_images(posts):
+    """Миниатюры и варианты для srcset всем постам сразу."""
+    return image_variants.attach_sources(attach_thumbnails(posts))
+
+
+class ThumbnailedPosts:
+    """
+    Посты страницы, которым картинки проставляются при первом
+    обращении: если фрагмент ленты взят из кеша, запросов не будет.
+    """
+
+    def __init__(self, posts):
+        self._posts = posts
+        self._result = None
+
+    def _evaluate(self):
+        if self._result is None:
+            self._result = attach_images(list(self._posts))
+        return self._result
+
+    def __iter__(self):
+        return iter(self._evaluate())
+
+    def __len__(self):
+        return len(self._evaluate())
+
+    def __getitem__(self, index):
+        return self._evaluate()[index]
+
+
+def prepare_page(page_obj):
+    page_obj.object_list = ThumbnailedPosts(page_obj.object_list)
+    return page_obj
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, syndication, views
 from django.conf import settings
 from django.conf.urls.static import static
 from posts.apps import PostsConfig
@@ -9,6 +9,25 @@ app_name = PostsConfig.name
 urlpatterns = [
     path("", views.index, name="index"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("popular/", views.popular, name="popular"),
+    path("search/", views.search, name="search"),
+    path("feeds/<str:format>/", syndication.index_feed, name="index_feed"),
+    path("group/<slug:slug>/feed/<str:format>/", syndication.group_feed,
+         name="group_feed"),
+    path("profile/<str:username>/feed/<str:format>/",
+         syndication.profile_feed, name="profile_feed"),
+    path("api/posts/", api.post_list, name="api_post_list"),
+    path("api/posts/<int:post_id>/", api.post_detail, name="api_post_detail"),
+    path("api/posts/<int:post_id>/comments/", api.comment_list,
+         name="api_comment_list"),
+    path("api/groups/", api.group_list, name="api_group_list"),
+    path("api/groups/<slug:slug>/posts/", api.group_post_list,
+         name="api_group_post_list"),
+    path("api/profiles/<str:username>/posts/", api.profile_post_list,
+         name="api_profile_post_list"),
+    path("api/follow/", api.follow_list, name="api_follow_list"),
+    path("api/follow/posts/", api.follow_post_list,
+         name="api_follow_post_list"),
     path("profile/<str:username>/follow/", views.profile_follow,
          name="profile_follow"),
     path("profile/<str:username>/unfollow/", views.profile_unfollow,
@@ -20,6 +39,8 @@ urlpatterns = [
     path("posts/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     # path("404/", views.page_not_found, name="404"),
     # path("500/", views.server_error, name="500"),
+    path("posts/<int:post_id>/comments/", views.post_comments,
+         name="post_comments"),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
     path("<str:username>/<int:post_id>/delete/", views.post_delete,
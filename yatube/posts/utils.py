@@ -1,9 +1,158 @@
-from django.core.paginator import Paginator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
 POST_PAGES: int = 10
+COMMENT_PAGES: int = 20
+CURSOR_PARAM: str = 'cursor'
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, value, pk):
+    """Упаковывает позицию в ленте в непрозрачный токен."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{direction}|{value}|{pk}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, parse=parse_datetime):
+    """
+    Распаковывает токен курсора. Для битого токена возвращает None,
+    чтобы вызывающий код показал первую страницу.
+    """
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        direction, value, pk = raw.split('|')
+        value = parse(value)
+        pk = int(pk)
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or value is None:
+        return None
+    return direction, value, pk
+
+
+class CursorPage(Page):
+    """
+    Страница курсорной пагинации: вместо номеров страниц
+    отдаёт токены соседних страниц.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по паре (field, pk), по умолчанию в порядке убывания.
+
+    В отличие от Paginator не делает COUNT(*) и OFFSET: каждая страница -
+    это диапазонный запрос по индексу, поэтому стоимость не зависит
+    от глубины страницы.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 parse=parse_datetime, ascending=False):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+        # Разбор значения field из токена
+        self.parse = parse
+        self.ascending = ascending
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return row[self.field], row['id']
+        return getattr(row, self.field), row.pk
+
+    def _cursor(self, direction, row):
+        return encode_cursor(direction, *self._position(row))
+
+    def _descending(self, direction):
+        return (direction == NEXT) != self.ascending
+
+    def _after(self, direction, value, pk):
+        field = self.field
+        if self._descending(direction):
+            return (Q(**{f'{field}__lte': value})
+                    & ~Q(**{field: value, 'pk__gte': pk}))
+        return (Q(**{f'{field}__gte': value})
+                & ~Q(**{field: value, 'pk__lte': pk}))
+
+    def get_page(self, cursor=None):
+        position = decode_cursor(cursor, self.parse) if cursor else None
+        direction = position[0] if position else NEXT
+        queryset = self.object_list
+        if position:
+            queryset = queryset.filter(self._after(*position))
+        if self._descending(direction):
+            queryset = queryset.order_by(f'-{self.field}', '-pk')
+        else:
+            queryset = queryset.order_by(self.field, 'pk')
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            has_next, has_previous = has_more, position is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self._cursor(NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = self._cursor(PREVIOUS, rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+class CountedPaginator(Paginator):
+    """Paginator, берущий число объектов из счётчика, а не из COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count
+
+
+def use_cursor_pagination(request):
+    """Курсорный режим включается параметром ?cursor= или настройкой."""
+    return (CURSOR_PARAM in request.GET
+            or getattr(settings, 'POSTS_CURSOR_PAGINATION', False))
 
 
-def paginate_page(request, post_list):
-    page_obj = Paginator(post_list, POST_PAGES)
+def paginate_page(request, post_list, count=None, field='pub_date'):
+    if use_cursor_pagination(request):
+        paginator = CursorPaginator(post_list, POST_PAGES, field)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
+    if count is not None:
+        page_obj = CountedPaginator(post_list, POST_PAGES, count)
+    else:
+        page_obj = Paginator(post_list, POST_PAGES)
     page_number = request.GET.get('page')
     return page_obj.get_page(page_number)
@@ -1,32 +1,65 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect
-from django.shortcuts import render, get_object_or_404, redirect, reverse
-
 from django.core.paginator import Paginator
-from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-from .utils import paginate_page
-
+from django.http import (
+    Http404, HttpResponse, HttpResponseRedirect, JsonResponse,
+)
+from django.shortcuts import render, get_object_or_404, redirect, reverse
 
-POST_PAGES = 10
+from . import follow_graph, notifications, ranking, thumbnails
+from .counters import (
+    author_posts_count, group_posts_count, post_comments_count,
+)
+from .feed import feed_version, follow_feed, read_time_authors
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Post, Group, User
+from .page_cache import (
+    FEED_SCOPE, add_page_scopes, cache_page_for_anonymous, group_scope,
+    post_scope, profile_scope,
+)
+from .search import search_posts
+from .utils import (
+    COMMENT_PAGES, CURSOR_PARAM, NEXT, POST_PAGES, CursorPaginator,
+    encode_cursor, paginate_page,
+)
 
 
-def get_page_context(request, queryset):
-    paginator = Paginator(request, POST_PAGES)
-    page_number = queryset.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def get_page_context(queryset, request, count=None):
+    page_obj = thumbnails.prepare_page(
+        paginate_page(request, queryset, count)
+    )
     return {
-        'paginator': paginator,
-        'page_number': page_number,
+        'paginator': page_obj.paginator,
+        'page_number': request.GET.get('page'),
         'page_obj': page_obj,
     }
 
 
+@cache_page_for_anonymous(FEED_SCOPE)
 def index(request):
-    context = get_page_context(Post.objects.all(), request)
+    context = get_page_context(Post.objects.for_feed(), request)
     return render(request, 'posts/index.html', context)
 
 
+@cache_page_for_anonymous(FEED_SCOPE, ranking.POPULAR_SCOPE,
+                          timeout=ranking.cache_timeout)
+def popular(request):
+    """
+    Популярные посты. Порядок берётся из закешированного рейтинга,
+    посты страницы - одним запросом по id.
+    """
+    page_obj = Paginator(ranking.top_ids(), POST_PAGES).get_page(
+        request.GET.get('page')
+    )
+    page_obj.object_list = ranking.RankedPosts(page_obj.object_list)
+    context = {
+        'page_obj': thumbnails.prepare_page(page_obj),
+        'popular': True,
+    }
+    return render(request, 'posts/popular.html', context)
+
+
+@cache_page_for_anonymous(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.all()[:POST_PAGES]
@@ -34,37 +67,104 @@ def group_posts(request, slug):
         'group': group,
         'posts': posts,
     }
-    context.update(get_page_context(group.posts.all(), request))
+    context.update(get_page_context(
+        group.posts.for_feed(), request, group_posts_count(group),
+    ))
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_page_for_anonymous(profile_scope)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = (
-        request.user.is_authenticated and Follow.objects.filter(
-            user=request.user, author=author,
-        ).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username,
     )
+    count = author_posts_count(author)
     context = {
         'author': author,
-        'following': following,
+        'count': count,
+        'following': follow_graph.is_following(request.user, author.pk),
+        'followers_count': follow_graph.followers_count(author),
+        'following_count': follow_graph.following_count(author),
     }
-    context.update(get_page_context(author.posts.all(), request))
+    context.update(
+        get_page_context(author.posts.for_feed(), request, count)
+    )
     return render(request, 'posts/profile.html', context)
 
 
+@cache_page_for_anonymous(post_scope)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    count = post.author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id,
+    )
+    thumbnails.attach_images([post])
+    count = author_posts_count(post.author)
+    # Число постов автора меняется вместе с его профилем
+    add_page_scopes(request, profile_scope(post.author.username))
     context = {
-        'post': get_object_or_404(Post, pk=post_id),
+        'post': post,
         'count': count,
+        'comments_count': post_comments_count(post),
         'is_edit': post.author == request.user,
         'comment_form': CommentForm(),
+        'comments': comments_paginator(post.pk).get_page(
+            request.GET.get(CURSOR_PARAM)
+        ),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_paginator(post_id):
+    """Комментарии поста от старых к новым, курсор по (created, id)."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author',
+    ).only('id', 'text', 'created', 'post_id', 'author__username')
+    return CursorPaginator(comments, COMMENT_PAGES, 'created',
+                           ascending=True)
+
+
+@cache_page_for_anonymous(post_scope)
+def post_comments(request, post_id):
+    """
+    Фрагмент с комментариями, написанными после комментария ?after=id,
+    чтобы страница поста дозагружала новые без перерисовки. Без after -
+    первая страница; 204, если новых нет.
+    """
+    after = request.GET.get('after')
+    cursor = None
+    if after:
+        created = Comment.objects.filter(
+            post_id=post_id, pk=after if after.isdigit() else None,
+        ).values_list('created', flat=True).first()
+        if created is None:
+            raise Http404
+        cursor = encode_cursor(NEXT, created, after)
+    elif not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    page = comments_paginator(post_id).get_page(cursor)
+    if not page.object_list:
+        return HttpResponse(status=204)
+    return render(request, 'posts/include/comment_list.html',
+                  {'comments': page})
+
+
+def search(request):
+    form = SearchForm(request.GET or None)
+    context = {'form': form}
+    if form.is_valid():
+        posts = search_posts(form.cleaned_data['q'],
+                             form.cleaned_data['group'])
+        paginator = CursorPaginator(posts, POST_PAGES, field='score',
+                                    parse=int)
+        query = request.GET.copy()
+        query.pop(CURSOR_PARAM, None)
+        context['page_obj'] = thumbnails.prepare_page(
+            paginator.get_page(request.GET.get(CURSOR_PARAM))
+        )
+        context['page_query'] = query.urlencode() + '&'
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -74,6 +174,10 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule_post(post)
+        notifications.enqueue(post, request.build_absolute_uri(
+            reverse('posts:post_detail', args=(post.pk,))
+        ))
         return redirect('posts:profile', post.author.username)
     return render(request, template, {'form': form})
 
@@ -88,7 +192,9 @@ def post_edit(request, post_id):
     form = PostForm(request.POST or None,
                     files=request.FILES or None, instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule_post(post)
         return redirect('posts:post_detail', post_id=post_id)
 
     return render(request, 'posts/create_post.html',
@@ -98,38 +204,67 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comment_list = post.comments.all()
+    # Автор и группа нужны сигналам, сбрасывающим кеш страниц поста
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id,
+    )
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
         comment.save()
+        if request.is_ajax():
+            # Странице поста нужен только новый комментарий
+            return render(request, 'posts/include/comment_list.html',
+                          {'comments': [comment]}, status=201)
         return redirect('posts:post_detail', post_id=post_id)
-    return render(
-        request, 'posts/include/comments.html', {
-            'form': form, "comments": comment_list}
-    )
+    if request.method == 'GET':
+        return redirect('posts:post_detail', post_id=post_id)
+    return render(request, 'posts/include/comments.html',
+                  {'form': form, 'post': post}, status=400)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate_page(request, posts)
-    context = {'page_obj': page_obj}
+    authors = read_time_authors(request.user)
+    posts = follow_feed(request.user, authors).for_feed()
+    context = {
+        'page_obj': thumbnails.prepare_page(
+            paginate_page(request, posts, field='feed_date')
+        ),
+        'follow': True,
+        'feed_version': feed_version(request.user, authors),
+        'cache_timeout': settings.FOLLOW_FEED_CACHE_TIMEOUT,
+    }
     return render(request, 'posts/follow.html', context)
 
 
+def follow_response(request, username, change):
+    """
+    Подписка или отписка одной командой SQL. AJAX-запрос получает
+    {"following": ..., "changed": ...}, обычный - редирект в профиль.
+    """
+    try:
+        changed = change(request.user, username)
+    except User.DoesNotExist:
+        raise Http404
+    if request.is_ajax():
+        return JsonResponse({
+            # На себя подписаться нельзя
+            'following': (change is follow_graph.follow
+                          and request.user.username != username),
+            'changed': changed,
+        })
+    return redirect('posts:profile', username=username)
+
+
 @login_required
 def profile_follow(request, username):
     """
     Подписка на автора
     """
-    if request.user.username != username:
-        author = get_object_or_404(User, username=username)
-        Follow.objects.get_or_create(user=request.user, author=author)
-    return redirect(reverse('posts:profile', args=[username]))
+    return follow_response(request, username, follow_graph.follow)
 
 
 @login_required
@@ -137,10 +272,7 @@ def profile_unfollow(request, username):
     """
     Дизлайк, отписка
     """
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user, author=author)
-    is_follower.delete()
-    return redirect('posts:profile', username=author)
+    return follow_response(request, username, follow_graph.unfollow)
 
 
 @login_required
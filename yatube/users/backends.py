@@ -0,0 +1,39 @@
+"""
+Загрузка request.user из кеша.
+
+ModelBackend читает строку пользователя на каждом запросе, этот
+бэкенд - только при промахе кеша. Кеш сбрасывают сигналы users.signals
+при сохранении и удалении пользователя (в том числе смене пароля) и
+при выходе. Хеш сессии Django сверяет с паролем из закешированного
+объекта, поэтому после смены пароля старые сессии всё так же
+перестают действовать. Сброс виден только процессам с тем же кешем,
+поэтому с кешем в памяти процесса (USER_CACHE_ENABLED выключен)
+бэкенд читает пользователя из базы, как ModelBackend.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not getattr(settings, 'USER_CACHE_ENABLED', True):
+            return super().get_user(user_id)
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user,
+                          getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 15))
+            return user
+        # Как ModelBackend: неактивный пользователь не восстанавливается
+        return user if self.user_can_authenticate(user) else None
@@ -1,3 +1,65 @@
-# from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .backends import user_key
+
+User = get_user_model()
+
+
+CACHED_SESSIONS = 'django.contrib.sessions.backends.cached_db'
+
+
+# Кеш тестов в памяти одного процесса здесь и есть общий
+@override_settings(USER_CACHE_ENABLED=True, SESSION_ENGINE=CACHED_SESSIONS)
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader',
+                                             password='old-secret-1')
+        self.client.login(username='reader', password='old-secret-1')
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('about:author'))
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        return [query['sql'] for query in captured
+                if 'django_session' in query['sql']
+                or 'auth_user' in query['sql']]
+
+    def test_session_and_user_come_from_cache(self):
+        self.auth_queries()
+        self.assertEqual(self.auth_queries(), [])
+
+    def test_password_change_drops_cached_user(self):
+        self.auth_queries()
+        self.user.set_password('new-secret-2')
+        self.user.save()
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+        response = self.client.get(reverse('about:author'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_logout_drops_cached_user(self):
+        self.auth_queries()
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+    def test_inactive_cached_user_is_not_restored(self):
+        self.auth_queries()
+        self.user.is_active = False
+        # В кеше уже неактивный пользователь, в базе он не менялся
+        cache.set(user_key(self.user.pk), self.user)
+        response = self.client.get(reverse('about:author'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    @override_settings(USER_CACHE_ENABLED=False)
+    def test_user_is_read_from_db_without_shared_cache(self):
+        self.auth_queries()
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.get(reverse('about:author'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,6 +37,14 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
+# ModelBackend остаётся вторым: сессии, начатые до кеширования
+# пользователя, ссылаются на него
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 60 * 15
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -55,6 +66,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы замер охватывал остальные middleware
+    'core.profiling.ProfilingMiddleware',
+    # Снаружи сессий: сохранение сессии тоже запись
+    'core.database.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,7 +84,9 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfilingTemplates',
+        # Прежний псевдоним движка, чтобы работал engines['django']
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,13 +105,72 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+# Профиль базы выбирает переменная окружения YATUBE_DB_PROFILE:
+# development - SQLite, соединение на каждый запрос;
+# sqlite - постоянные соединения, журнал WAL и настроенные PRAGMA;
+# postgresql - пул соединений, чтение лент с реплик, хосты которых
+# перечислены через запятую в YATUBE_DB_REPLICAS; нужен psycopg2
+# из requirements-prod.txt
+DATABASE_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'development')
+
+SQLITE_DATABASE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
 }
 
+if DATABASE_PROFILE == 'development':
+    DATABASES = {'default': SQLITE_DATABASE}
+elif DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            **SQLITE_DATABASE,
+            'CONN_MAX_AGE': 600,
+            # Ждать блокировку записи, а не падать сразу
+            'OPTIONS': {'timeout': 20},
+            # Выполняются на каждом новом соединении (core.database)
+            'PRAGMAS': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'cache_size': -64000,
+                'mmap_size': 256 * 1024 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        }
+    }
+elif DATABASE_PROFILE == 'postgresql':
+    POSTGRESQL_DATABASE = {
+        'ENGINE': 'core.postgresql_pool',
+        'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+        'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+        'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('YATUBE_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('YATUBE_DB_PORT', '5432'),
+        # Соединение возвращается в пул в конце каждого запроса
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN': 2,
+            'MAX': int(os.environ.get('YATUBE_DB_POOL_MAX', 20)),
+        },
+    }
+    DATABASES = {'default': POSTGRESQL_DATABASE}
+    replica_hosts = os.environ.get('YATUBE_DB_REPLICAS', '').split(',')
+    for number, host in enumerate(filter(None, replica_hosts), 1):
+        DATABASES[f'replica{number}'] = {
+            **POSTGRESQL_DATABASE,
+            'HOST': host.strip(),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    raise ImproperlyConfigured(
+        f'Неизвестный профиль базы YATUBE_DB_PROFILE={DATABASE_PROFILE}'
+    )
+
+# Реплики читают только ленты; после записи клиент ещё
+# REPLICA_PIN_SECONDS читает основную базу
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.database.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -133,8 +209,115 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Курсорная пагинация лент по умолчанию (иначе только по ?cursor=)
+POSTS_CURSOR_PAGINATION = False
+
+# Посты авторов с большим числом подписчиков не рассылаются по лентам,
+# а добавляются в ленту подписок при чтении
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+# Команда materialize_feeds возвращает автора к рассылке, когда
+# подписчиков не больше FEED_FANOUT_MAX_FOLLOWERS * FEED_MATERIALIZE_RATIO
+FEED_MATERIALIZE_RATIO = 0.9
+
+# Время жизни страниц в кеше для анонимов; устаревшие страницы
+# сбрасываются сигналами раньше
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Время жизни фрагмента ленты подписок; попадания и промахи видны
+# на /internal/cache/
+FOLLOW_FEED_CACHE_TIMEOUT = 60 * 5
+
+# Сколько хранится в кеше документ RSS/Atom/JSON-ленты; новый пост
+# меняет ETag раньше
+SYNDICATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры готовятся в фоне; 0 - синхронно, в потоке запроса
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_BACKEND = 'posts.thumbnails.NonBlockingBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.CachedKVStore'
+
+# Письма подписчикам о новом посте отправляются в фоне пачками по
+# NOTIFICATION_BATCH_SIZE; 0 потоков - сразу после коммита, в потоке
+# запроса. Прерванные рассылки дорабатывает process_notifications
+NOTIFICATION_WORKERS = 2
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_MAX_ATTEMPTS = 3
+
+# Рейтинг /popular/: очки постов угасают вдвое за POPULAR_HALF_LIFE_HOURS;
+# команда decay_scores по расписанию (например, раз в 15 минут) угашает
+# их за время, прошедшее с прошлого запуска. Верхние POPULAR_SIZE постов
+# и страница для анонимов кешируются на POPULAR_CACHE_TIMEOUT секунд
+POPULAR_HALF_LIFE_HOURS = 6
+POPULAR_SIZE = 100
+POPULAR_CACHE_TIMEOUT = 60
+
+# Профиль кеша выбирает переменная окружения YATUBE_CACHE_PROFILE:
+# local - память процесса: только для одного процесса и тестов;
+# shared - файл SQLite, общий для всех воркеров на одной машине;
+# memcached и redis - сервер из YATUBE_CACHE_LOCATION, клиенты pylibmc
+# и django-redis ставятся из requirements-prod.txt. Кроме local,
+# записи и сбросы версий страниц видят все процессы
+CACHE_PROFILE = os.environ.get('YATUBE_CACHE_PROFILE', 'local')
+CACHE_LOCATION = os.environ.get('YATUBE_CACHE_LOCATION')
+
+if CACHE_PROFILE == 'local':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.profiling.LocMemCache',
+        }
     }
-}
+elif CACHE_PROFILE == 'shared':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.profiling.SQLiteCache',
+            'LOCATION': CACHE_LOCATION or os.path.join(
+                BASE_DIR, 'cache.sqlite3',
+            ),
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+elif CACHE_PROFILE == 'memcached':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.profiling.PyLibMCCache',
+            'LOCATION': CACHE_LOCATION or '127.0.0.1:11211',
+        }
+    }
+elif CACHE_PROFILE == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.redis_cache.RedisCache',
+            'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+        }
+    }
+else:
+    raise ImproperlyConfigured(
+        f'Неизвестный профиль кеша YATUBE_CACHE_PROFILE={CACHE_PROFILE}'
+    )
+
+# Сессии читаются из кеша и пишутся в базу сквозь него, пользователь
+# запроса тоже берётся из кеша, - только с кешем, общим для всех
+# процессов: выход и смена пароля сбрасывают кеш лишь там, где видны
+SHARED_CACHE = CACHE_PROFILE != 'local'
+USER_CACHE_ENABLED = SHARED_CACHE
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if SHARED_CACHE
+    else 'django.contrib.sessions.backends.db'
+)
+
+# Гистограммы времени ответа по view за последние минуты на
+# /internal/requests/; заголовок Server-Timing видят все при DEBUG,
+# иначе только персонал
+PROFILING_WINDOW_MINUTES = 15
+PROFILING_SERVER_TIMING = DEBUG
+
+# Аудит SQL: одинаковый запрос QUERY_AUDIT_DUPLICATES раз за запрос
+# к сайту - вероятный N+1; запросы дольше QUERY_AUDIT_SLOW_MS - медленные.
+# В строгом режиме находки роняют запрос исключением, что нужно тестам.
+# Аудит подключается к соединениям только при QUERY_AUDIT_ENABLED: обход
+# стека на каждый повторный запрос не нужен в продакшене
+TESTING = 'pytest' in sys.modules or sys.argv[1:2] == ['test']
+QUERY_AUDIT_ENABLED = DEBUG or TESTING
+QUERY_AUDIT_DUPLICATES = 3
+QUERY_AUDIT_SLOW_MS = 100
+QUERY_AUDIT_STRICT = False
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 from about.apps import AboutConfig
+from core.apps import CoreConfig
 from posts.apps import PostsConfig
 from users.apps import UsersConfig
 
@@ -18,6 +19,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace=UsersConfig.name)),
     path('auth/', include('django.contrib.auth.urls')),
     path("admin/", admin.site.urls),
+    path('internal/', include('core.urls', namespace=CoreConfig.name)),
     path("", include('posts.urls', namespace=PostsConfig.name)),
 ]
 